@@ -0,0 +1,1919 @@
+# Árbol AVL de propiedades indexado por la métrica price / surface_total.
+# pandas y anytree se importan solo dentro de las funciones que los usan, para que importar el módulo sea rápido.
+import math
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from contextlib import nullcontext
+from numbers import Real
+
+import numpy as np
+
+from instrumentation import TreeMetrics, instrumented
+from spatial_index import SpatialIndex
+
+# Columnas numéricas del dataset de propiedades
+NUMERIC_COLUMNS = ('latitude', 'longitude', 'surface_total', 'surface_covered', 'bedrooms', 'bathrooms', 'price')
+
+# Valores de cada criterio que no filtran nada en search_nodes_by_criteria
+NEUTRAL_CRITERIA = {
+    'city': ('', None),
+    'department': ('', None),
+    'bedrooms': (0, None),
+    'price': (0, None, math.inf),
+    'min_metric': (-math.inf,),
+    'max_metric': (math.inf,),
+}
+
+# Clase para almacenar las columnas de las propiedades una sola vez, en arreglos de NumPy.
+# Las columnas de texto guardan códigos enteros (int32, -1 para faltantes) y un vocabulario por columna;
+# el texto se decodifica solo al materializar una fila.
+# El identificador de una propiedad (property_id) no cambia nunca; normalmente es su posición en las columnas,
+# pero después de compact las primeras len(ids) posiciones guardan las propiedades ids (en orden creciente)
+# y las posiciones siguientes los identificadores consecutivos desde tail_id
+class PropertyStore:
+    def __init__(self):
+        self.columns = {}
+        self.numeric = set()
+        self.vocabularies = {}
+        self.codes = {}
+        self.size = 0
+        self.capacity = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.tail_id = 0
+
+    # Función para crear el almacén a partir de un DataFrame sin recorrerlo fila por fila
+    @classmethod
+    def from_dataframe(cls, df):
+        store = cls()
+        store.extend(df)
+        return store
+
+    # Función para agregar una propiedad al almacén; retorna el identificador de su fila
+    def append(self, property_data):
+        if self.size == self.capacity:
+            self._grow(max(16, 2 * self.capacity))
+
+        row = self.size
+        for name, value in property_data.items():
+            is_number = isinstance(value, Real) and not isinstance(value, bool)
+            if name not in self.columns:
+                self._add_column(name, name in NUMERIC_COLUMNS or is_number)
+            elif name in self.numeric and name not in NUMERIC_COLUMNS and not is_number and value is not None:
+                self._promote_to_text(name)
+            self.columns[name][row] = value if name in self.numeric else self._encode(name, value)
+        for name, column in self.columns.items():
+            if name not in property_data:
+                column[row] = np.nan if name in self.numeric else -1
+
+        self.size += 1
+        return self.row_id(row)
+
+    # Función para agregar un bloque de filas de un DataFrame; retorna el identificador de la primera fila
+    def extend(self, df):
+        import pandas as pd
+
+        first = self.size
+        if self.size + len(df) > self.capacity:
+            self._grow(max(16, 2 * self.capacity, self.size + len(df)))
+
+        end = self.size + len(df)
+        for name in df.columns:
+            # El tipo de las columnas conocidas lo fija NUMERIC_COLUMNS; una columna desconocida que llegó vacía
+            # (y por eso numérica) en un bloque anterior pasa a ser de texto si un bloque posterior trae texto
+            is_number = pd.api.types.is_numeric_dtype(df[name])
+            if name not in self.columns:
+                self._add_column(name, name in NUMERIC_COLUMNS or is_number)
+            elif name in self.numeric and name not in NUMERIC_COLUMNS and not is_number:
+                self._promote_to_text(name)
+            if name in self.numeric:
+                self.columns[name][first:end] = pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float)
+            else:
+                self.columns[name][first:end] = self._encode_many(name, df[name])
+        for name, column in self.columns.items():
+            if name not in df.columns:
+                column[first:end] = np.nan if name in self.numeric else -1
+
+        self.size = end
+        return self.row_id(first)
+
+    # Función para obtener una vista de solo lectura con las columnas actuales; comparte los arreglos, pero el
+    # diccionario de columnas es propio, así las columnas que se agreguen después no la afectan
+    def view(self):
+        view = PropertyStore()
+        view.columns = dict(self.columns)
+        view.numeric = frozenset(self.numeric)
+        # Los vocabularios solo crecen al final, así que compartirlos no cambia los códigos que la vista conoce
+        view.vocabularies = dict(self.vocabularies)
+        view.codes = dict(self.codes)
+        # Con capacidad igual al tamaño, agregar una fila a la vista copiaría los arreglos en lugar de escribirlos
+        view.size = view.capacity = self.size
+        view.ids = self.ids
+        view.tail_id = self.tail_id
+        return view
+
+    # Función para crear un almacén nuevo solo con las propiedades indicadas (identificadores en orden creciente);
+    # conservan su identificador y las que se agreguen después siguen desde el siguiente libre
+    def compact(self, ids):
+        store = PropertyStore()
+        positions = self.positions(ids)
+        for name, column in self.columns.items():
+            store.columns[name] = column[positions]
+        store.numeric = set(self.numeric)
+        store.vocabularies = self.vocabularies
+        store.codes = self.codes
+        store.size = store.capacity = len(ids)
+        store.ids = np.asarray(ids, dtype=np.int64)
+        store.tail_id = self.row_id(self.size)
+        return store
+
+    # Función para obtener el identificador de la propiedad guardada en una posición
+    def row_id(self, position):
+        if position < len(self.ids):
+            return int(self.ids[position])
+        return self.tail_id + position - len(self.ids)
+
+    # Función para obtener la posición en las columnas de un identificador
+    def position(self, row):
+        if row >= self.tail_id:
+            return row - self.tail_id + len(self.ids)
+        return int(np.searchsorted(self.ids, row))
+
+    # Función vectorizada de position para un arreglo de identificadores
+    def positions(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(self.ids) == 0 and self.tail_id == 0:
+            return rows
+        return np.where(rows >= self.tail_id, rows - self.tail_id + len(self.ids), np.searchsorted(self.ids, rows))
+
+    # Función para obtener una columna (decodificada si es de texto) en un arreglo de identificadores
+    def take(self, rows, name):
+        values = self.columns[name][self.positions(rows)]
+        return values if name in self.numeric else self.decode(name, values)
+
+    # Función para convertir un arreglo de códigos de una columna de texto en sus valores
+    def decode(self, name, codes):
+        # La lista se copia de una vez: una vista comparte el vocabulario con el almacén, que puede seguir creciendo
+        values = self.vocabularies[name] + [None]
+        vocabulary = np.empty(len(values), dtype=object)
+        vocabulary[:] = values
+        return vocabulary[codes]
+
+    # Función para materializar una fila como diccionario solo cuando se necesita
+    def get(self, row):
+        row = self.position(row)
+        return {
+            name: column[row].item() if name in self.numeric else self._decode(name, column[row])
+            for name, column in self.columns.items()
+        }
+
+    # Función para obtener el valor de una columna en una fila sin crear el diccionario completo
+    def value(self, row, name):
+        value = self.columns[name][self.position(row)]
+        return value if name in self.numeric else self._decode(name, value)
+
+    # Función para verificar si una fila cumple los criterios de ciudad, departamento, dormitorios y precio
+    def meets_criteria(self, row, criteria):
+        row = self.position(row)
+        for name in ('city', 'department'):
+            if criteria.get(name) and self.columns[name][row] != self._code(name, criteria[name]):
+                return False
+        if criteria.get('bedrooms') and self.columns['bedrooms'][row] < criteria['bedrooms']:
+            return False
+        if criteria.get('price') and self.columns['price'][row] > criteria['price']:
+            return False
+        return True
+
+    # Función vectorizada de meets_criteria para un arreglo de filas; también aplica min_metric y max_metric
+    def criteria_mask(self, rows, criteria):
+        rows = self.positions(rows)
+        mask = np.ones(len(rows), dtype=bool)
+        for name in ('city', 'department'):
+            if criteria.get(name):
+                mask &= self.columns[name][rows] == self._code(name, criteria[name])
+        if criteria.get('bedrooms'):
+            mask &= ~(self.columns['bedrooms'][rows] < criteria['bedrooms'])
+        if criteria.get('price'):
+            mask &= ~(self.columns['price'][rows] > criteria['price'])
+        if 'min_metric' in criteria or 'max_metric' in criteria:
+            metrics = self.columns['price'][rows] / self.columns['surface_total'][rows]
+            mask &= (metrics >= criteria.get('min_metric', -math.inf)) & (metrics <= criteria.get('max_metric', math.inf))
+        return mask
+
+    # Función para obtener un valor numérico usable en sumas; los faltantes cuentan como 0
+    def number(self, row, name):
+        if name not in self.numeric:
+            return 0.0
+        value = self.columns[name][self.position(row)]
+        return 0.0 if value != value else float(value)
+
+    # Función auxiliar que obtiene el código de un valor de texto para comparar; -2 si el valor no existe,
+    # así no coincide con ninguna fila (tampoco con las faltantes, que tienen -1)
+    def _code(self, name, value):
+        if name in self.numeric:
+            return value
+        return self._codes(name).get(value, -2)
+
+    # Función auxiliar que retorna el diccionario de valor a código de una columna de texto; se arma recién
+    # cuando se necesita, así abrir una copia binaria no recorre vocabularios de un millón de títulos
+    def _codes(self, name):
+        if name not in self.codes:
+            self.codes[name] = {value: code for code, value in enumerate(self.vocabularies[name])}
+        return self.codes[name]
+
+    # Función auxiliar que retorna el valor de un código (None para -1)
+    def _decode(self, name, code):
+        return None if code < 0 else self.vocabularies[name][code]
+
+    # Función auxiliar que retorna el código de un valor, agregándolo al vocabulario si es nuevo
+    def _encode(self, name, value):
+        if value is None or value != value:
+            return -1
+        codes = self._codes(name)
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.vocabularies[name])
+            self.vocabularies[name].append(value)
+        return code
+
+    # Función auxiliar que codifica un arreglo de valores de una vez: cada valor distinto se busca una sola vez
+    def _encode_many(self, name, values):
+        import pandas as pd
+
+        local, uniques = pd.factorize(np.asarray(values, dtype=object))
+        mapping = np.array([self._encode(name, value) for value in uniques] + [-1], dtype=np.int32)
+        return mapping[local]
+
+    # Función auxiliar para ampliar la capacidad de todas las columnas
+    def _grow(self, capacity):
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+        self.capacity = capacity
+
+    # Función auxiliar para agregar una columna nueva rellenando las filas existentes
+    def _add_column(self, name, numeric):
+        if numeric:
+            self.columns[name] = np.full(self.capacity, np.nan)
+            self.numeric.add(name)
+        else:
+            self.columns[name] = np.full(self.capacity, -1, dtype=np.int32)
+            self.vocabularies[name] = []
+
+    # Función auxiliar para convertir una columna numérica en una de texto; los faltantes quedan como -1
+    def _promote_to_text(self, name):
+        column = self.columns[name]
+        self.numeric.discard(name)
+        self.vocabularies[name] = []
+        self.codes.pop(name, None)
+        promoted = np.full(len(column), -1, dtype=np.int32)
+        promoted[:self.size] = self._encode_many(name, column[:self.size].tolist())
+        self.columns[name] = promoted
+
+# Máximo de entradas por bloque de un índice secundario antes de partirlo en dos
+RUN_CAPACITY = 1024
+
+# Clase para una lista ordenada de entradas (valor..., métrica, fila) partida en bloques de a lo más RUN_CAPACITY;
+# cada bloque guarda sus campos en arreglos contiguos (array 'd' y 'q'), así insertar o borrar mueve solo las
+# entradas de un bloque y se busca con bisect sobre los máximos de los bloques y luego dentro del bloque
+class SortedRuns:
+    __slots__ = ('width', 'runs', 'maxes', 'size', '_offsets')
+
+    def __init__(self, width):
+        self.width = width
+        self.runs = []
+        self.maxes = []
+        self.size = 0
+        self._offsets = None
+
+    # Función para crear la lista a partir de tuplas ya ordenadas
+    @classmethod
+    def from_sorted(cls, entries):
+        runs = cls(len(entries[0]) if entries else 2)
+        fill = RUN_CAPACITY // 2
+        for first in range(0, len(entries), fill):
+            block = entries[first:first + fill]
+            runs.runs.append([array(runs._typecode(field), column) for field, column in enumerate(zip(*block))])
+            runs.maxes.append(block[-1])
+        runs.size = len(entries)
+        return runs
+
+    def __len__(self):
+        return self.size
+
+    # Función para agregar una entrada en su posición ordenada
+    def add(self, entry):
+        if not self.runs:
+            self.runs.append([array(self._typecode(field)) for field in range(self.width)])
+            self.maxes.append(entry)
+        index = min(bisect_left(self.maxes, entry), len(self.runs) - 1)
+        run = self.runs[index]
+        position = self._bisect(run, entry, right=True)
+        for column, value in zip(run, entry):
+            column.insert(position, value)
+        if position == len(run[0]) - 1:
+            self.maxes[index] = entry
+        if len(run[0]) > RUN_CAPACITY:
+            half = len(run[0]) // 2
+            self.runs[index + 1:index + 1] = [[column[half:] for column in run]]
+            for column in run:
+                del column[half:]
+            self.maxes[index:index + 1] = [self._entry(run, half - 1), self.maxes[index]]
+        self.size += 1
+        self._offsets = None
+
+    # Función para quitar una entrada; retorna False si no estaba
+    def remove(self, entry):
+        index = bisect_left(self.maxes, entry)
+        if index == len(self.runs):
+            return False
+        run = self.runs[index]
+        position = self._bisect(run, entry, right=False)
+        if position == len(run[0]) or self._entry(run, position) != entry:
+            return False
+        for column in run:
+            del column[position]
+        if not run[0]:
+            del self.runs[index]
+            del self.maxes[index]
+        elif position == len(run[0]):
+            self.maxes[index] = self._entry(run, position - 1)
+        self.size -= 1
+        self._offsets = None
+        return True
+
+    # Funciones para obtener la posición global de una clave, con la misma semántica que bisect sobre tuplas
+    def bisect_left(self, key):
+        return self._position(bisect_left(self.maxes, key), key, right=False)
+
+    def bisect_right(self, key):
+        return self._position(bisect_right(self.maxes, key), key, right=True)
+
+    # Función para recorrer los pares (métrica, fila) de las posiciones start..end - 1
+    def pairs(self, start, end):
+        offsets = self._run_offsets()
+        index = max(bisect_right(offsets, start) - 1, 0)
+        while start < end and index < len(self.runs):
+            metrics, rows = self.runs[index][-2:]
+            first = start - offsets[index]
+            last = min(end - offsets[index], len(rows))
+            yield from zip(metrics[first:last], rows[first:last])
+            start = offsets[index] + last
+            index += 1
+
+    # Función auxiliar que traduce un bloque y una clave a la posición global
+    def _position(self, index, key, right):
+        if index == len(self.runs):
+            return self.size
+        return self._run_offsets()[index] + self._bisect(self.runs[index], key, right)
+
+    # Función auxiliar con la posición de inicio de cada bloque; se recalcula solo después de un cambio
+    def _run_offsets(self):
+        if self._offsets is None:
+            self._offsets = [0]
+            for run in self.runs:
+                self._offsets.append(self._offsets[-1] + len(run[0]))
+        return self._offsets
+
+    # Función auxiliar para buscar una clave (completa o un prefijo) dentro de un bloque campo por campo;
+    # un prefijo es menor que todas sus extensiones, igual que al comparar tuplas
+    def _bisect(self, run, key, right):
+        lo, hi = 0, len(run[0])
+        for field, value in enumerate(key):
+            column = run[field]
+            if field == len(key) - 1:
+                if right and len(key) == self.width:
+                    return bisect_right(column, value, lo, hi)
+                return bisect_left(column, value, lo, hi)
+            lo, hi = bisect_left(column, value, lo, hi), bisect_right(column, value, lo, hi)
+        return lo
+
+    @staticmethod
+    def _entry(run, position):
+        return tuple(column[position] for column in run)
+
+    def _typecode(self, field):
+        return 'q' if field == self.width - 1 else 'd'
+
+# Clase para los índices secundarios: listas ordenadas por bloques (SortedRuns) de entradas (valor, métrica, fila)
+class SecondaryIndexes:
+    def __init__(self):
+        self.by_city = {}
+        self.by_department = {}
+        self.by_price = SortedRuns(3)
+        self.by_bedrooms = SortedRuns(3)
+
+    # Función para crear los índices de un conjunto de entradas (métrica, fila) ordenando una sola vez
+    @classmethod
+    def build(cls, entries, store):
+        indexes = cls()
+        cities = {}
+        departments = {}
+        prices = []
+        bedrooms = []
+        for metric, row in entries:
+            for target, entry in indexes._locate(metric, row, store, cities, departments, prices, bedrooms):
+                target.append(entry)
+        indexes.by_price = SortedRuns.from_sorted(sorted(prices)) if prices else SortedRuns(3)
+        indexes.by_bedrooms = SortedRuns.from_sorted(sorted(bedrooms)) if bedrooms else SortedRuns(3)
+        for groups, collected in ((indexes.by_city, cities), (indexes.by_department, departments)):
+            for value, group in collected.items():
+                groups[value] = SortedRuns.from_sorted(sorted(group))
+        return indexes
+
+    # Función para registrar un nodo nuevo en todos los índices
+    def add(self, metric, row, store):
+        for runs, entry in self._locate(metric, row, store, self.by_city, self.by_department,
+                                        self.by_price, self.by_bedrooms):
+            runs.add(entry)
+
+    # Función para eliminar un nodo de todos los índices
+    def remove(self, metric, row, store):
+        for runs, entry in self._locate(metric, row, store, self.by_city, self.by_department,
+                                        self.by_price, self.by_bedrooms):
+            runs.remove(entry)
+
+    # Función que elige el índice más selectivo y retorna las entradas (métrica, fila) candidatas;
+    # metric_count es el número de nodos que recorrería el árbol principal en el rango de métricas
+    def plan(self, criteria, metric_count):
+        lo = criteria['min_metric']
+        hi = criteria['max_metric']
+        options = [('metric', (None, 0, metric_count))]
+
+        for name, groups in (('city', self.by_city), ('department', self.by_department)):
+            if criteria.get(name):
+                entries = groups.get(criteria[name], SortedRuns(2))
+                options.append((name, self._metric_range(entries, lo, hi)))
+        if criteria.get('bedrooms'):
+            start = self.by_bedrooms.bisect_left((criteria['bedrooms'],))
+            options.append(('bedrooms', (self.by_bedrooms, start, len(self.by_bedrooms))))
+        if criteria.get('price'):
+            end = self.by_price.bisect_right((criteria['price'], math.inf))
+            options.append(('price', (self.by_price, 0, end)))
+
+        name, (entries, start, end) = min(options, key=lambda option: option[1][2] - option[1][1])
+        if entries is None:
+            return name, None
+        return name, entries.pairs(start, end)
+
+    # Función auxiliar que delimita en una lista ordenada por métrica el rango [lo, hi]
+    @staticmethod
+    def _metric_range(entries, lo, hi):
+        return entries, entries.bisect_left((lo, -1)), entries.bisect_right((hi, math.inf))
+
+    # Función auxiliar que retorna, para cada índice, el destino (lista o SortedRuns) y la tupla del nodo;
+    # los grupos de ciudad y departamento que faltan se crean en cities y departments
+    def _locate(self, metric, row, store, cities, departments, prices, bedrooms):
+        located = []
+        for name, groups in (('city', cities), ('department', departments)):
+            if name in store.columns:
+                value = store.value(row, name)
+                if value not in groups:
+                    groups[value] = [] if isinstance(prices, list) else SortedRuns(2)
+                located.append((groups[value], (metric, row)))
+        # Los valores faltantes se indexan en el extremo que siempre cumple el filtro, igual que en _meets_criteria
+        price = store.value(row, 'price') if 'price' in store.columns else math.nan
+        bedroom_count = store.value(row, 'bedrooms') if 'bedrooms' in store.columns else math.nan
+        located.append((prices, (-math.inf if math.isnan(price) else float(price), metric, row)))
+        located.append((bedrooms, (math.inf if math.isnan(bedroom_count) else float(bedroom_count), metric, row)))
+        return located
+
+# Clase para una copia de solo lectura del árbol en arreglos ordenados, consultada de forma vectorizada con NumPy
+class FrozenSnapshot:
+    def __init__(self, keys, rows, columns, numeric, version):
+        self.keys = keys
+        self.rows = rows
+        self.columns = columns
+        self.numeric = numeric
+        self.version = version
+
+    # Función para crear la copia a partir de las métricas y filas del árbol en orden
+    @classmethod
+    def from_tree(cls, tree):
+        keys = np.empty(get_size(tree.root), dtype=float)
+        rows = np.empty(get_size(tree.root), dtype=np.int64)
+        position = 0
+        for node in tree._inorder_nodes():
+            end = position + len(node.rows)
+            keys[position:end] = node.key
+            rows[position:end] = node.rows
+            position = end
+
+        # Se alinean las columnas con el orden de las métricas (el texto queda decodificado)
+        columns = {name: tree.store.take(rows, name) for name in tree.store.columns}
+        return cls(keys, rows, columns, set(tree.store.numeric), tree.version)
+
+    def __len__(self):
+        return len(self.keys)
+
+    # Función para buscar muchas métricas a la vez; retorna la posición de cada una o -1 si no existe
+    def lookup(self, metrics):
+        metrics = np.asarray(metrics, dtype=float)
+        positions = np.searchsorted(self.keys, metrics, side='left')
+        inside = positions < len(self.keys)
+        found = np.zeros(len(metrics), dtype=bool)
+        found[inside] = self.keys[positions[inside]] == metrics[inside]
+        return np.where(found, positions, -1)
+
+    # Función equivalente a search_node_by_metric para un arreglo de métricas
+    def batch_search(self, metrics, materialize=True):
+        positions = self.lookup(metrics)
+        if not materialize:
+            return positions
+        return [self.record(position) if position >= 0 else None for position in positions.tolist()]
+
+    # Función para resolver muchos rangos [lo, hi] a la vez con filtros opcionales;
+    # filters puede ser un diccionario de criterios común o una secuencia con uno por consulta
+    def batch_range(self, los, his, filters=None, materialize=True):
+        starts = np.searchsorted(self.keys, np.asarray(los, dtype=float), side='left')
+        ends = np.searchsorted(self.keys, np.asarray(his, dtype=float), side='right')
+        if filters is None or isinstance(filters, dict):
+            filters = [filters] * len(starts)
+
+        masks = {}
+        results = []
+        for start, end, criteria in zip(starts.tolist(), ends.tolist(), filters):
+            positions = np.arange(start, max(start, end))
+            if criteria:
+                key = tuple(sorted(criteria.items()))
+                if key not in masks:
+                    masks[key] = self.mask(criteria)
+                positions = positions[masks[key][start:end]]
+            results.append([self.record(position) for position in positions.tolist()] if materialize else positions)
+        return results
+
+    # Función que evalúa los criterios de _meets_criteria sobre todas las filas con máscaras booleanas
+    def mask(self, criteria):
+        mask = np.ones(len(self.keys), dtype=bool)
+        for name in ('city', 'department'):
+            if criteria.get(name) and name in self.columns:
+                mask &= self.columns[name] == criteria[name]
+        # Igual que en _meets_criteria, los valores faltantes no descartan la fila
+        if criteria.get('bedrooms') and 'bedrooms' in self.columns:
+            mask &= ~(self.columns['bedrooms'] < criteria['bedrooms'])
+        if criteria.get('price') and 'price' in self.columns:
+            mask &= ~(self.columns['price'] > criteria['price'])
+        return mask
+
+    # Función para materializar como diccionario la propiedad en una posición de la copia
+    def record(self, position):
+        return {
+            name: column[position].item() if name in self.numeric else column[position]
+            for name, column in self.columns.items()
+        }
+
+# Clase para una caché LRU de resultados de consultas, válida solo para una versión del árbol
+class QueryCache:
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # Función que retorna el resultado guardado o lo calcula y lo guarda, desalojando el menos usado
+    def get_or_compute(self, key, version, compute):
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+                self.entries.clear()
+            self.version = version
+
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self._copy(self.entries[key])
+
+        self.misses += 1
+        value = compute()
+        self.entries[key] = value
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return self._copy(value)
+
+    # Función para obtener las estadísticas de uso de la caché
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    # Función para normalizar un diccionario de criterios quitando los filtros que no restringen nada;
+    # un valor se descarta solo si es neutro para su campo (ciudad vacía, 0 dormitorios, precio 0 o infinito),
+    # así un límite de métrica igual a 0 sigue formando parte de la clave
+    @staticmethod
+    def normalize_criteria(criteria):
+        return tuple(sorted(
+            (name, value) for name, value in criteria.items()
+            if value not in NEUTRAL_CRITERIA.get(name, ())
+        ))
+
+    # Función auxiliar que copia los resultados (listas y diccionarios, también los anidados)
+    # para que el llamador no modifique lo guardado
+    @staticmethod
+    def _copy(value):
+        if isinstance(value, list):
+            return [QueryCache._copy(item) for item in value]
+        if isinstance(value, tuple):
+            return tuple(QueryCache._copy(item) for item in value)
+        if isinstance(value, dict):
+            return {name: QueryCache._copy(item) for name, item in value.items()}
+        return value
+
+# Cada nodo guarda en rows todas las propiedades (filas del PropertyStore) que comparten la métrica,
+# además del número de propiedades de su subárbol y las sumas de precio y superficie del nodo y del subárbol
+class TreeNode:
+    __slots__ = ('key', 'rows', 'left', 'right', 'parent', 'height', 'size',
+                 'bucket_price', 'bucket_surface', 'sum_price', 'sum_surface')
+
+    def __init__(self, key, rows, parent=None):
+        self.key = key
+        self.rows = rows
+        self.left = None
+        self.right = None
+        self.parent = parent
+        self.height = 1
+        self.size = len(rows)
+        self.bucket_price = 0.0
+        self.bucket_surface = 0.0
+        self.sum_price = 0.0
+        self.sum_surface = 0.0
+
+# Función para recorrer en orden los nodos de un subárbol con una pila explícita
+def inorder(node):
+    stack = []
+    while stack or node:
+        while node:
+            stack.append(node)
+            node = node.left
+        node = stack.pop()
+        yield node
+        node = node.right
+
+# Función para obtener la altura de un nodo
+def get_height(node):
+    if node is None:
+        return 0
+    return node.height
+
+# Función para obtener el número de propiedades del subárbol de un nodo
+def get_size(node):
+    if node is None:
+        return 0
+    return node.size
+
+# Función para obtener el factor de equilibrio de un nodo
+def get_balance_factor(node):
+    if node is None:
+        return 0
+    return get_height(node.left) - get_height(node.right)
+
+# Función que retorna la clase de un motor de índice ('avl' o 'bplus'); ambas tienen la misma interfaz de
+# inserción, eliminación y búsqueda, y los mismos constructores from_dataframe y from_records
+def engine_class(engine):
+    if engine == 'avl':
+        return AVLTree
+    if engine == 'bplus':
+        from bplus_tree import BPlusTree
+
+        return BPlusTree
+    raise ValueError(f"Motor no válido: {engine!r}")
+
+# Función para crear un árbol vacío del motor pedido; los índices secundarios solo existen en el AVL
+def make_tree(engine='avl', store=None, indexes=False):
+    tree_class = engine_class(engine)
+    if tree_class is AVLTree:
+        return AVLTree(store, indexes)
+    if indexes:
+        raise ValueError(f"Los índices secundarios solo están disponibles con engine='avl', no con {engine!r}")
+    return tree_class(store)
+
+# Clase para representar un Árbol AVL
+class AVLTree:
+    def __init__(self, store=None, indexes=False):
+        self.root = None
+        self.store = store if store is not None else PropertyStore()
+        self.indexes = None
+        self.spatial = None
+        # El contador de versión aumenta con cada modificación e invalida la copia congelada
+        self.version = 0
+        self._snapshot = None
+        self.cache = None
+        # Registro de operaciones opcional (TreePersistence) que recibe cada inserción y eliminación
+        self.journal = None
+        self.metrics = None
+        self.node_count = 0
+        if indexes:
+            self.enable_secondary_indexes()
+
+    # Función para activar los índices secundarios (ciudad, departamento, precio y dormitorios)
+    def enable_secondary_indexes(self):
+        entries = ((node.key, row) for node in self._inorder_nodes() for row in node.rows)
+        self.indexes = SecondaryIndexes.build(entries, self.store)
+
+    # Función para activar el índice espacial por latitud y longitud (celdas de cell_degrees grados)
+    def enable_spatial_index(self, cell_degrees=0.01):
+        rows = (row for node in self._inorder_nodes() for row in node.rows)
+        self.spatial = SpatialIndex.build(rows, self.store, cell_degrees)
+
+    # Función para activar los contadores y los histogramas de latencia; retorna el objeto de métricas
+    def enable_metrics(self):
+        self.metrics = TreeMetrics(self)
+        return self.metrics
+
+    # Función para activar la caché de resultados de búsquedas y parentescos
+    def enable_query_cache(self, maxsize=128):
+        self.cache = QueryCache(maxsize)
+
+    # Función auxiliar que consulta la caché, si está activa, antes de calcular un resultado
+    def _cached(self, key, compute):
+        if self.cache is None:
+            return compute()
+        return self.cache.get_or_compute(key, self.version, compute)
+
+    # Función para obtener una copia de solo lectura en arreglos ordenados; se reconstruye si el árbol cambió
+    @instrumented('freeze')
+    def freeze(self):
+        if self._snapshot is None or self._snapshot.version != self.version:
+            self._snapshot = FrozenSnapshot.from_tree(self)
+        return self._snapshot
+
+    # Función para dejar en el almacén solo las filas que siguen en el árbol; cada propiedad conserva su
+    # identificador (PropertyStore.compact) y se retorna cuántas filas se descartaron
+    def compact_store(self):
+        live = np.sort(np.fromiter((row for node in self._inorder_nodes() for row in node.rows), dtype=np.int64))
+        if len(live) == self.store.size:
+            return 0
+
+        # Otros árboles que compartían el almacén (p. ej. los de extract_range) conservan el anterior
+        dropped = self.store.size - len(live)
+        self.store = self.store.compact(live)
+        self.version += 1
+        return dropped
+
+    # Función auxiliar para recorrer los nodos en orden con una pila explícita
+    def _inorder_nodes(self):
+        return inorder(self.root)
+
+    # Función para insertar un nodo en el Árbol AVL
+    @instrumented('insert')
+    def insert(self, key, data):
+        row = self.store.append(data)
+        self._insert(key, row)
+        if self.journal:
+            self.journal.record({'op': 'insert', 'metric': key, 'data': data})
+        return row
+
+    # Función auxiliar que desciende iterativamente; si la métrica ya existe agrega la propiedad a su nodo,
+    # si no enlaza un nodo nuevo, y luego actualiza y rebalancea hacia arriba
+    def _insert(self, key, row):
+        self.version += 1
+        if self.indexes:
+            self.indexes.add(key, row, self.store)
+        if self.spatial:
+            self.spatial.add(row, self.store)
+
+        parent = None
+        node = self.root
+        steps = 0
+        while node:
+            steps += 1
+            if key == node.key:
+                if self.metrics:
+                    self.metrics.comparisons += steps
+                node.rows.append(row)
+                self._set_bucket_sums(node)
+                self._rebalance_upward(node)
+                return node
+            parent = node
+            node = node.left if key < node.key else node.right
+
+        if self.metrics:
+            self.metrics.comparisons += steps
+        self.node_count += 1
+        new_node = TreeNode(key, [row], parent)
+        self._set_bucket_sums(new_node)
+        self._update(new_node)
+        if parent is None:
+            self.root = new_node
+        elif key < parent.key:
+            parent.left = new_node
+        else:
+            parent.right = new_node
+
+        self._rebalance_upward(parent)
+        return new_node
+
+    # Función auxiliar que actualiza alturas y aplica rotaciones desde un nodo hasta la raíz
+    def _rebalance_upward(self, node):
+        while node:
+            self._update(node)
+            balance = get_balance_factor(node)
+
+            if balance > 1:
+                double = get_balance_factor(node.left) < 0
+                if double:
+                    self.rotate_left(node.left)
+                node = self.rotate_right(node)
+                if self.metrics:
+                    self._count_rotation(double)
+            elif balance < -1:
+                double = get_balance_factor(node.right) > 0
+                if double:
+                    self.rotate_right(node.right)
+                node = self.rotate_left(node)
+                if self.metrics:
+                    self._count_rotation(double)
+
+            node = node.parent
+
+    # Función auxiliar para contar una rotación simple o doble
+    def _count_rotation(self, double):
+        if double:
+            self.metrics.double_rotations += 1
+        else:
+            self.metrics.single_rotations += 1
+
+    # Función auxiliar que recalcula la altura, el tamaño y las sumas de un nodo a partir de sus hijos
+    def _update(self, node):
+        left = node.left
+        right = node.right
+        node.height = 1 + max(get_height(left), get_height(right))
+        node.size = len(node.rows) + get_size(left) + get_size(right)
+        node.sum_price = node.bucket_price
+        node.sum_surface = node.bucket_surface
+        if left:
+            node.sum_price += left.sum_price
+            node.sum_surface += left.sum_surface
+        if right:
+            node.sum_price += right.sum_price
+            node.sum_surface += right.sum_surface
+
+    # Función auxiliar que recalcula las sumas de precio y superficie de las propiedades del propio nodo
+    def _set_bucket_sums(self, node):
+        node.bucket_price = sum(self.store.number(row, 'price') for row in node.rows)
+        node.bucket_surface = sum(self.store.number(row, 'surface_total') for row in node.rows)
+
+    # Función auxiliar para reemplazar el hijo de un nodo (o la raíz) manteniendo el puntero al padre
+    def _replace_child(self, parent, old, new):
+        if parent is None:
+            self.root = new
+        elif parent.left is old:
+            parent.left = new
+        else:
+            parent.right = new
+        if new:
+            new.parent = parent
+
+    # Función para realizar una rotación a la izquierda en el Árbol AVL
+    def rotate_left(self, z):
+        if z is None or z.right is None:
+            if self.metrics:
+                self.metrics.noop_rotations += 1
+            return z
+
+        y = z.right
+        T2 = y.left
+
+        self._replace_child(z.parent, z, y)
+        y.left = z
+        z.parent = y
+        z.right = T2
+        if T2:
+            T2.parent = z
+
+        self._update(z)
+        self._update(y)
+
+        return y
+    
+    # Función para realizar una rotación a la derecha en el Árbol AVL
+    def rotate_right(self, y):
+        if y is None or y.left is None:
+            if self.metrics:
+                self.metrics.noop_rotations += 1
+            return y
+
+        x = y.left
+        T2 = x.right
+
+        self._replace_child(y.parent, y, x)
+        x.right = y
+        y.parent = x
+        y.left = T2
+        if T2:
+            T2.parent = y
+
+        self._update(y)
+        self._update(x)
+
+        return x
+
+    # Función para construir el Árbol AVL a partir de un DataFrame en O(n) después de ordenar
+    @classmethod
+    def from_dataframe(cls, df):
+        # Se calcula la métrica price / surface_total para todas las filas en un solo paso
+        metrics = (df['price'] / df['surface_total']).to_numpy(dtype=float)
+        store = PropertyStore.from_dataframe(df)
+
+        tree = cls(store)
+        tree._bulk_build(metrics, np.arange(len(metrics)))
+        return tree
+
+    # Función para construir el Árbol AVL a partir de una secuencia de diccionarios
+    @classmethod
+    def from_records(cls, records):
+        keys = []
+        store = PropertyStore()
+        for property_data in records:
+            keys.append(property_data['price'] / property_data['surface_total'])
+            store.append(property_data)
+
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        return cls._from_sorted([keys[i] for i in order], order, store)
+
+    # Función auxiliar para crear un árbol a partir de llaves ya ordenadas; las métricas iguales comparten nodo
+    # en el orden de las filas, así el contenido es el mismo que con insert_property repetido (solo cambia la forma)
+    @classmethod
+    def _from_sorted(cls, keys, rows, store):
+        distinct_keys = []
+        buckets = []
+        for key, row in zip(keys, rows):
+            if distinct_keys and distinct_keys[-1] == key:
+                buckets[-1].append(row)
+            else:
+                distinct_keys.append(key)
+                buckets.append([row])
+
+        return cls._from_buckets(distinct_keys, buckets, store)
+
+    # Función auxiliar para crear un árbol a partir de métricas distintas ordenadas y sus filas
+    @classmethod
+    def _from_buckets(cls, keys, buckets, store):
+        tree = cls(store)
+        tree.root = tree._build_balanced(keys, buckets, 0, len(keys))
+        tree.node_count = len(keys)
+        return tree
+
+    # Función auxiliar para construir el árbol completo (que debe estar vacío) a partir de arreglos de métricas
+    # y filas; se ordena una sola vez, con orden estable para conservar el orden de inserción entre métricas
+    # iguales, y las sumas de precio y superficie de cada nodo se calculan por bloques con np.add.reduceat
+    def _bulk_build(self, metrics, rows):
+        order = np.argsort(metrics, kind='stable')
+        keys = metrics[order]
+        rows = rows[order]
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) if len(keys) else np.array([], dtype=np.int64)
+        ends = np.append(starts[1:], len(rows)).tolist()
+        row_list = rows.tolist()
+        buckets = [row_list[a:b] for a, b in zip(starts.tolist(), ends)]
+        prices, surfaces = (self._bucket_sums(rows, starts, name) for name in ('price', 'surface_total'))
+
+        self.root = self._build_balanced(keys[starts].tolist(), buckets, 0, len(buckets), prices, surfaces)
+        self.node_count = len(buckets)
+        self.version += 1
+        if self.indexes is not None:
+            self.enable_secondary_indexes()
+        if self.spatial is not None:
+            self.enable_spatial_index(self.spatial.cell_degrees)
+
+    # Función auxiliar que suma una columna numérica por bloques de filas; los faltantes cuentan como 0
+    def _bucket_sums(self, rows, starts, name):
+        if name not in self.store.numeric or len(rows) == 0:
+            return [0.0] * len(starts)
+        values = self.store.take(rows, name)
+        return np.add.reduceat(np.where(np.isnan(values), 0.0, values), starts).tolist()
+
+    # Función auxiliar que construye un subárbol perfectamente balanceado con el elemento central como raíz;
+    # la altura, el tamaño y las sumas se calculan aquí mismo (sin _update), porque en un árbol de un millón
+    # de filas esta función se llama cientos de miles de veces
+    def _build_balanced(self, keys, buckets, lo, hi, bucket_prices=None, bucket_surfaces=None):
+        if lo >= hi:
+            return None
+
+        mid = (lo + hi) // 2
+        node = TreeNode(keys[mid], buckets[mid])
+        left = node.left = self._build_balanced(keys, buckets, lo, mid, bucket_prices, bucket_surfaces)
+        right = node.right = self._build_balanced(keys, buckets, mid + 1, hi, bucket_prices, bucket_surfaces)
+        if bucket_prices is None:
+            self._set_bucket_sums(node)
+        else:
+            node.bucket_price = bucket_prices[mid]
+            node.bucket_surface = bucket_surfaces[mid]
+        # Con el elemento central como raíz, la altura depende solo del número de nodos del rango
+        node.height = (hi - lo).bit_length()
+        node.sum_price = node.bucket_price
+        node.sum_surface = node.bucket_surface
+        if left:
+            left.parent = node
+            node.size += left.size
+            node.sum_price += left.sum_price
+            node.sum_surface += left.sum_surface
+        if right:
+            right.parent = node
+            node.size += right.size
+            node.sum_price += right.sum_price
+            node.sum_surface += right.sum_surface
+        return node
+
+    # Función para insertar un nodo en el Árbol AVL utilizando la métrica
+    @instrumented('insert_property')
+    def insert_property(self, property_data):
+        metric1 = property_data['price'] / property_data['surface_total']
+        row = self.store.append(property_data)
+        self._insert(metric1, row)
+        if self.journal:
+            self.journal.record({'op': 'insert', 'data': property_data})
+        return row
+
+    # Función para cargar un CSV (plano o comprimido con gzip) por bloques, con memoria acotada por el tamaño del bloque
+    def load_csv(self, path, chunksize=50_000):
+        import pandas as pd
+
+        stats = {'rows_read': 0, 'rows_inserted': 0, 'rows_dropped': 0}
+        start = time.perf_counter()
+
+        # Si el árbol está vacío, los bloques solo se copian al almacén y el árbol se construye una vez al final
+        bulk = self.root is None
+        metric_chunks = []
+        row_chunks = []
+
+        # Las filas con un número incorrecto de campos se descartan al leer
+        for chunk in pd.read_csv(path, chunksize=chunksize, compression='infer', on_bad_lines='skip'):
+            cleaned = self._clean_chunk(chunk)
+            stats['rows_read'] += len(chunk)
+            stats['rows_dropped'] += len(chunk) - len(cleaned)
+            if bulk:
+                metrics = (cleaned['price'] / cleaned['surface_total']).to_numpy(dtype=float)
+                first = self.store.extend(cleaned)
+                metric_chunks.append(metrics)
+                row_chunks.append(np.arange(first, first + len(metrics)))
+                stats['rows_inserted'] += len(metrics)
+            else:
+                stats['rows_inserted'] += self._insert_dataframe(cleaned)
+
+        if bulk and metric_chunks:
+            self._bulk_build(np.concatenate(metric_chunks), np.concatenate(row_chunks))
+        # Las filas cargadas no pasan por el registro de operaciones; se guardan escribiendo una copia nueva
+        if self.journal and stats['rows_inserted']:
+            self.journal.checkpoint()
+        return self._finish_stats(stats, start)
+
+    # Función para insertar las propiedades de un generador de diccionarios descartando las inválidas
+    def insert_records(self, records):
+        stats = {'rows_read': 0, 'rows_inserted': 0, 'rows_dropped': 0}
+        start = time.perf_counter()
+
+        for property_data in records:
+            stats['rows_read'] += 1
+            if self._is_valid_property(property_data):
+                self.insert_property(property_data)
+                stats['rows_inserted'] += 1
+            else:
+                stats['rows_dropped'] += 1
+
+        return self._finish_stats(stats, start)
+
+    # Función para insertar un bloque ya validado; las métricas se calculan de forma vectorizada.
+    # Si el árbol tiene registro de operaciones, el bloque se guarda escribiendo una copia nueva
+    def insert_dataframe(self, df):
+        inserted = self._insert_dataframe(df)
+        if self.journal and inserted:
+            self.journal.checkpoint()
+        return inserted
+
+    # Función auxiliar de insert_dataframe, sin escribir la copia nueva
+    def _insert_dataframe(self, df):
+        metrics = (df['price'] / df['surface_total']).to_numpy(dtype=float)
+        first = self.store.extend(df)
+        for offset, metric1 in enumerate(metrics.tolist()):
+            self._insert(metric1, first + offset)
+        return len(metrics)
+
+    # Función auxiliar que convierte las columnas numéricas y conserva solo filas con precio válido y superficie positiva
+    @staticmethod
+    def _clean_chunk(df):
+        import pandas as pd
+
+        if 'price' not in df.columns or 'surface_total' not in df.columns:
+            return df.iloc[0:0]
+
+        df = df.assign(**{
+            name: pd.to_numeric(df[name], errors='coerce')
+            for name in NUMERIC_COLUMNS if name in df.columns
+        })
+        valid = np.isfinite(df['price']) & np.isfinite(df['surface_total']) & (df['surface_total'] > 0)
+        return df[valid]
+
+    # Función auxiliar para validar una propiedad individual antes de calcular su métrica
+    @staticmethod
+    def _is_valid_property(property_data):
+        try:
+            price = float(property_data['price'])
+            surface = float(property_data['surface_total'])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return math.isfinite(price) and math.isfinite(surface) and surface > 0
+
+    # Función auxiliar para completar las estadísticas de carga con el rendimiento en filas por segundo
+    @staticmethod
+    def _finish_stats(stats, start):
+        stats['seconds'] = time.perf_counter() - start
+        stats['rows_per_second'] = stats['rows_read'] / stats['seconds'] if stats['seconds'] > 0 else float('inf')
+        return stats
+
+    # Función para convertir el Árbol AVL a una estructura de árbol general AnyTree
+    def _convert_to_anytree(self, node):
+        from anytree import Node
+
+        if node:
+            data = [self.store.get(row) for row in node.rows]
+            new_node = Node(f"Key: {node.key}, Data: {data[0] if len(data) == 1 else data}")
+            children = []
+
+            if node.left:
+                children.append(self._convert_to_anytree(node.left))
+            if node.right:
+                children.append(self._convert_to_anytree(node.right))
+
+            new_node.children = children
+            return new_node
+        
+    # Función para imprimir el Árbol AVL en forma de árbol
+    def print_tree(self):
+        if self.root is not None:
+            print(self.render_tree())
+
+    # Función para obtener como texto el dibujo del Árbol AVL
+    def render_tree(self):
+        from anytree import RenderTree
+
+        if self.root is None:
+            return ''
+        anytree_root = self._convert_to_anytree(self.root)
+        return '\n'.join(f"{pre}{node.name}" for pre, fill, node in RenderTree(anytree_root))
+
+    # Función para eliminar por métrica todas las propiedades del nodo, o solo la indicada por property_id;
+    # retorna el número de propiedades eliminadas
+    @instrumented('delete_node_by_metric')
+    def delete_node_by_metric(self, metric, property_id=None):
+        node = self._find_node(metric)
+        if not node:
+            return 0
+
+        if property_id is None:
+            removed = list(node.rows)
+        elif property_id in node.rows:
+            removed = [property_id]
+        else:
+            return 0
+
+        self.version += 1
+        if self.indexes:
+            for row in removed:
+                self.indexes.remove(node.key, row, self.store)
+        if self.spatial:
+            for row in removed:
+                self.spatial.remove(row, self.store)
+
+        if len(removed) == len(node.rows):
+            self._delete_node(node)
+        else:
+            node.rows.remove(property_id)
+            self._set_bucket_sums(node)
+            self._rebalance_upward(node)
+        if self.journal:
+            self.journal.record({'op': 'delete', 'metric': metric, 'property_id': property_id})
+        return len(removed)
+
+    # Función auxiliar que desenlaza un nodo y rebalancea desde su padre hasta la raíz
+    def _delete_node(self, node):
+        # Si el nodo tiene dos hijos, se copia el sucesor en orden y se elimina el sucesor
+        if node.left and node.right:
+            successor = self._get_min_value_node(node.right)
+            node.key = successor.key
+            node.rows = successor.rows
+            node.bucket_price = successor.bucket_price
+            node.bucket_surface = successor.bucket_surface
+            node = successor
+
+        child = node.left or node.right
+        parent = node.parent
+        self.node_count -= 1
+        self._replace_child(parent, node, child)
+        self._rebalance_upward(parent)
+
+    # Función para obtener el nodo con el valor mínimo en el Árbol AVL
+    def _get_min_value_node(self, node):
+        while node.left:
+            node = node.left
+        return node
+
+    # Función para unir al final de este árbol otro árbol cuyas métricas son todas mayores; el otro árbol queda vacío.
+    # Solo se rebalancea el borde derecho de este árbol hasta la altura del otro
+    @instrumented('join')
+    def join(self, other):
+        if self.root and other.root and self._get_max_value_node(self.root).key >= self._get_min_value_node(other.root).key:
+            raise ValueError("Las métricas del árbol a unir deben ser mayores que las de este árbol")
+
+        with self._journal_group():
+            self._adopt(other)
+            self.version += 1
+            self.root = self._join_trees(self.root, other.root)
+            self.node_count += other.node_count
+            other._clear()
+
+    # Función para separar el árbol por una métrica: este árbol conserva las métricas menores
+    # y se retorna un árbol nuevo, con el mismo almacén, con las métricas mayores o iguales
+    @instrumented('split')
+    def split(self, metric):
+        return self._extract_range(metric, math.inf)
+
+    # Función para agregar todas las propiedades de otro árbol; el otro árbol queda vacío.
+    # Cada nodo del otro árbol parte a este árbol en su métrica y las mitades se vuelven a unir,
+    # así el costo es O(m log(n/m + 1)) sin rebalancear propiedad por propiedad
+    @instrumented('union')
+    def union(self, other):
+        if other is self:
+            return
+
+        with self._journal_group():
+            self._adopt(other)
+            self.version += 1
+            self.root, shared = self._union(self.root, other.root)
+            self.node_count += other.node_count - shared
+            other._clear()
+
+    # Función para eliminar todas las propiedades con métrica entre lo y hi (inclusive);
+    # retorna el número de propiedades eliminadas
+    @instrumented('delete_range')
+    def delete_range(self, lo, hi):
+        removed = self._extract_range(lo, hi)
+        return get_size(removed.root)
+
+    # Función para sacar del árbol las propiedades con métrica entre lo y hi (inclusive);
+    # se retornan en un árbol nuevo que comparte el almacén
+    @instrumented('extract_range')
+    def extract_range(self, lo, hi):
+        return self._extract_range(lo, hi)
+
+    # Función auxiliar que separa el rango con dos cortes y une lo que queda a cada lado
+    def _extract_range(self, lo, hi):
+        left, found_lo, rest = self._split(self.root, lo)
+        middle, found_hi, right = self._split(rest, hi)
+        if found_lo:
+            middle = self._join(None, found_lo, middle)
+        if found_hi:
+            middle = self._join(middle, found_hi, None)
+        self.root = self._join_trees(left, right)
+
+        extracted = type(self)(self.store)
+        extracted.root = middle
+        # Se cuentan los nodos del lado con menos propiedades
+        if get_size(middle) <= get_size(self.root):
+            extracted.node_count = sum(1 for _ in inorder(middle))
+        else:
+            extracted.node_count = self.node_count - sum(1 for _ in inorder(self.root))
+        self.node_count -= extracted.node_count
+
+        if middle:
+            self.version += 1
+            if self.indexes or self.spatial:
+                for node in inorder(middle):
+                    for row in node.rows:
+                        if self.indexes:
+                            self.indexes.remove(node.key, row, self.store)
+                        if self.spatial:
+                            self.spatial.remove(row, self.store)
+            if self.journal:
+                self.journal.record({'op': 'delete_range', 'lo': lo, 'hi': hi})
+        return extracted
+
+    # Función auxiliar que lleva las filas de otro árbol a este almacén (si no lo comparten),
+    # a los índices secundarios y al registro de operaciones. Las filas de otro almacén se registran como
+    # inserciones; las de un árbol que comparte el almacén (p. ej. uno de extract_range) ya existen, y se
+    # registran con sus identificadores para que al reproducir el registro se vuelvan a enlazar las mismas filas
+    def _adopt(self, other):
+        foreign = other.store is not self.store
+        if not (foreign or self.indexes or self.spatial or self.journal):
+            return
+
+        restored = []
+        for node in inorder(other.root):
+            if foreign:
+                node.rows = [self.store.append(other.store.get(row)) for row in node.rows]
+            for row in node.rows:
+                if self.indexes:
+                    self.indexes.add(node.key, row, self.store)
+                if self.spatial:
+                    self.spatial.add(row, self.store)
+                if self.journal:
+                    if foreign:
+                        self.journal.record({'op': 'insert', 'data': self.store.get(row)})
+                    else:
+                        restored.append([node.key, row])
+        if restored:
+            self.journal.record({'op': 'restore_rows', 'entries': restored})
+
+    # Función auxiliar para volver a enlazar filas (métrica, fila) que ya están en el almacén; es la operación
+    # que reproduce una entrada 'restore_rows' del registro
+    def _restore_rows(self, entries):
+        restored = type(self)(self.store)
+        if entries:
+            metrics, rows = zip(*entries)
+            restored._bulk_build(np.array(metrics, dtype=float), np.array(rows, dtype=np.int64))
+        self.union(restored)
+
+    # Función auxiliar que deja vacío un árbol cuyos nodos pasaron a otro; si ese árbol tiene su propio
+    # registro de operaciones, se anota que quedó vacío
+    def _clear(self):
+        had_rows = self.root is not None
+        self.root = None
+        self.node_count = 0
+        self.version += 1
+        if self.indexes:
+            self.enable_secondary_indexes()
+        if self.spatial:
+            self.enable_spatial_index(self.spatial.cell_degrees)
+        if self.journal and had_rows:
+            self.journal.record({'op': 'delete_range', 'lo': -math.inf, 'hi': math.inf})
+
+    # Función auxiliar que agrupa en el registro las entradas de una operación (ver TreePersistence.group)
+    def _journal_group(self):
+        return self.journal.group() if self.journal else nullcontext()
+
+    # Función auxiliar para la unión recursiva; retorna la raíz y cuántas métricas estaban en ambos árboles
+    def _union(self, a, b):
+        if a is None:
+            return b, 0
+        if b is None:
+            return a, 0
+
+        b_left, b_right = b.left, b.right
+        self._detach(b)
+        left, found, right = self._split(a, b.key)
+        shared = 0
+        if found:
+            # Las filas de cada nodo se mantienen en orden creciente (el cursor de iter_range depende de eso);
+            # si el otro árbol usa otro almacén sus filas son nuevas y basta con agregarlas al final
+            found.rows.extend(b.rows)
+            if b.rows[0] < found.rows[len(found.rows) - len(b.rows) - 1]:
+                found.rows.sort()
+            found.bucket_price += b.bucket_price
+            found.bucket_surface += b.bucket_surface
+            b = found
+            shared = 1
+
+        left, shared_left = self._union(left, b_left)
+        right, shared_right = self._union(right, b_right)
+        return self._join(left, b, right), shared + shared_left + shared_right
+
+    # Función auxiliar que parte un subárbol por una métrica; retorna el subárbol de las métricas menores,
+    # el nodo con la métrica (o None) y el subárbol de las mayores, todos sin padre
+    def _split(self, node, metric):
+        if node is None:
+            return None, None, None
+
+        left, right = node.left, node.right
+        self._detach(node)
+        if metric == node.key:
+            return left, node, right
+        if metric < node.key:
+            lower, found, upper = self._split(left, metric)
+            return lower, found, self._join(upper, node, right)
+        lower, found, upper = self._split(right, metric)
+        return self._join(left, node, lower), found, upper
+
+    # Función auxiliar que une dos subárboles sin nodo intermedio usando el mínimo del segundo como unión
+    def _join_trees(self, left, right):
+        if right is None:
+            if left:
+                left.parent = None
+            return left
+        _, minimum, rest = self._split(right, self._get_min_value_node(right).key)
+        return self._join(left, minimum, rest)
+
+    # Función auxiliar que une left, node y right (métricas en ese orden); el nodo se cuelga del borde
+    # del subárbol más alto a la altura del otro y se rebalancea solo hacia arriba desde ahí
+    def _join(self, left, node, right):
+        if get_height(left) > get_height(right) + 1:
+            parent = left
+            while get_height(parent.right) > get_height(right) + 1:
+                parent = parent.right
+            self._link(node, parent.right, right)
+            parent.right = node
+        elif get_height(right) > get_height(left) + 1:
+            parent = right
+            while get_height(parent.left) > get_height(left) + 1:
+                parent = parent.left
+            self._link(node, left, parent.left)
+            parent.left = node
+        else:
+            self._link(node, left, right)
+            node.parent = None
+            return node
+
+        node.parent = parent
+        # Las rotaciones en la raíz de un subárbol suelto reemplazan self.root; quien llama lo restablece al final
+        self._rebalance_upward(parent)
+        while node.parent:
+            node = node.parent
+        return node
+
+    # Función auxiliar que asigna los hijos de un nodo y recalcula sus valores
+    def _link(self, node, left, right):
+        node.left = left
+        node.right = right
+        if left:
+            left.parent = node
+        if right:
+            right.parent = node
+        self._update(node)
+
+    # Función auxiliar que suelta un nodo de su padre y de sus hijos
+    @staticmethod
+    def _detach(node):
+        if node.left:
+            node.left.parent = None
+        if node.right:
+            node.right.parent = None
+        node.left = node.right = node.parent = None
+
+    # Función para obtener el nodo con el valor máximo de un subárbol
+    def _get_max_value_node(self, node):
+        while node.right:
+            node = node.right
+        return node
+
+    # Función auxiliar para ubicar iterativamente el nodo con una métrica
+    def _find_node(self, metric):
+        node = self.root
+        steps = 0
+        while node:
+            steps += 1
+            if metric < node.key:
+                node = node.left
+            elif metric > node.key:
+                node = node.right
+            else:
+                break
+        if self.metrics:
+            self.metrics.comparisons += steps
+        return node
+
+    # Función para buscar un nodo por métrica
+    @instrumented('search_node_by_metric')
+    def search_node_by_metric(self, metric):
+        return self._cached(('search', metric), lambda: self._search_node_by_metric(metric))
+
+    # Función auxiliar para buscar un nodo por métrica
+    def _search_node_by_metric(self, metric):
+        node = self._find_node(metric)
+        return self.store.get(node.rows[0]) if node else None
+
+    # Función para obtener todas las propiedades con una métrica, indexadas por su identificador
+    @instrumented('search_properties_by_metric')
+    def search_properties_by_metric(self, metric):
+        return self._cached(('properties', metric), lambda: self._search_properties_by_metric(metric))
+
+    # Función auxiliar para obtener todas las propiedades con una métrica
+    def _search_properties_by_metric(self, metric):
+        node = self._find_node(metric)
+        return {row: self.store.get(row) for row in node.rows} if node else {}
+
+    # Función para buscar nodos que cumplan con ciertos criterios
+    @instrumented('search_nodes_by_criteria')
+    def search_nodes_by_criteria(self, criteria):
+        key = ('criteria', QueryCache.normalize_criteria(criteria))
+        return self._cached(key, lambda: self._collect_nodes_by_criteria(criteria))
+
+    # Función auxiliar que elige entre el índice secundario y el recorrido del árbol principal
+    def _collect_nodes_by_criteria(self, criteria):
+        criteria = {'min_metric': -math.inf, 'max_metric': math.inf, **criteria}
+        nodes_found = []
+        if self.indexes:
+            visited, filtered = self._search_nodes_by_index(criteria, nodes_found)
+        else:
+            visited, filtered = self._search_nodes_by_criteria(self.root, criteria, nodes_found)
+        if self.metrics:
+            self.metrics.observe_criteria(visited, filtered)
+        return nodes_found
+
+    # Función auxiliar que recorre solo los candidatos del índice secundario más selectivo;
+    # retorna cuántos candidatos visitó y cuántos descartó _meets_criteria
+    def _search_nodes_by_index(self, criteria, result):
+        _, candidates = self.indexes.plan(criteria, self.count_range(criteria['min_metric'], criteria['max_metric']))
+        if candidates is None:
+            return self._search_nodes_by_criteria(self.root, criteria, result)
+
+        visited = 0
+        filtered = 0
+        for metric, row in candidates:
+            visited += 1
+            if criteria['min_metric'] <= metric <= criteria['max_metric']:
+                if self._meets_criteria(row, criteria):
+                    result.append(self.store.get(row))
+                else:
+                    filtered += 1
+        return visited, filtered
+
+    # Función auxiliar para buscar nodos que cumplan con ciertos criterios usando una pila explícita;
+    # retorna cuántos nodos visitó y cuántas propiedades descartó _meets_criteria
+    def _search_nodes_by_criteria(self, node, criteria, result):
+        visited = 0
+        filtered = 0
+        stack = [node] if node else []
+        while stack:
+            node = stack.pop()
+            visited += 1
+            if criteria['min_metric'] <= node.key <= criteria['max_metric']:
+                for row in node.rows:
+                    if self._meets_criteria(row, criteria):
+                        result.append(self.store.get(row))
+                    else:
+                        filtered += 1
+
+            if node.right and node.key <= criteria['max_metric']:
+                stack.append(node.right)
+            if node.left and node.key >= criteria['min_metric']:
+                stack.append(node.left)
+        return visited, filtered
+
+    # Función para verificar si un nodo cumple con ciertos criterios leyendo directamente las columnas
+    def _meets_criteria(self, row, criteria):
+        return self.store.meets_criteria(row, criteria)
+
+    # Función para obtener las k propiedades más cercanas a un punto que cumplan los criterios (ciudad,
+    # departamento, dormitorios, precio y rango de métrica); retorna pares (distancia en km, propiedad)
+    @instrumented('nearest')
+    def nearest(self, lat, lon, k=1, criteria=None):
+        return self._spatial_index().nearest(self.store, lat, lon, k, criteria)
+
+    # Función para obtener las propiedades a radius_km o menos de un punto que cumplan los criterios,
+    # ordenadas por distancia; retorna pares (distancia en km, propiedad)
+    @instrumented('within_radius')
+    def within_radius(self, lat, lon, radius_km, criteria=None):
+        return self._spatial_index().within_radius(self.store, lat, lon, radius_km, criteria)
+
+    # Función para obtener las propiedades dentro de un rectángulo de latitud y longitud que cumplan los criterios,
+    # ordenadas por métrica
+    @instrumented('within_bbox')
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon, criteria=None):
+        return self._spatial_index().within_bbox(self.store, min_lat, min_lon, max_lat, max_lon, criteria)
+
+    # Función auxiliar que activa el índice espacial la primera vez que se consulta
+    def _spatial_index(self):
+        if self.spatial is None:
+            self.enable_spatial_index()
+        return self.spatial
+
+    # Función para mostrar el menú adicional después de mostrar el recorrido por niveles
+    def show_menu_after_level_order(self):
+        while True:
+            print("\nMenú adicional:")
+            print("a. Obtener el nivel del nodo")
+            print("b. Obtener el factor de balanceo del nodo")
+            print("c. Encontrar el padre del nodo")
+            print("d. Encontrar el abuelo del nodo")
+            print("e. Encontrar el tío del nodo")
+            print("f. Volver al menú principal")
+
+            choice = input("Ingrese su elección: ")
+
+            if choice == "a":
+                metric_to_find = float(input("Ingrese la métrica1 del nodo para obtener su nivel: "))
+                level = self.get_node_level(metric_to_find)
+                if level is not None:
+                    print(f"Nivel del nodo con métrica {metric_to_find}: {level}")
+                else:
+                    print(f"Nodo con métrica {metric_to_find} no encontrado.")
+            elif choice == "b":
+                metric_to_find = float(input("Ingrese la métrica1 del nodo para obtener su factor de balanceo: "))
+                balance_factor = self.get_balance_factor_of_node(metric_to_find)
+                if balance_factor is not None:
+                    print(f"Factor de balanceo del nodo con métrica {metric_to_find}: {balance_factor}")
+                else:
+                    print(f"Nodo con métrica {metric_to_find} no encontrado.")
+            elif choice == "c":
+                metric_to_find = float(input("Ingrese la métrica1 del nodo para encontrar su padre: "))
+                parent_data = self.find_parent_of_node(metric_to_find)
+                if parent_data is not None:
+                    print(f"El padre del nodo con métrica {metric_to_find} es:")
+                    print(parent_data)
+                else:
+                    print(f"Nodo con métrica {metric_to_find} no encontrado.")
+            elif choice == "d":
+                metric_to_find = float(input("Ingrese la métrica1 del nodo para encontrar su abuelo: "))
+                grandparent_data = self.find_grandparent_of_node(metric_to_find)
+                if grandparent_data is not None:
+                    print(f"El abuelo del nodo con métrica {metric_to_find} es:")
+                    print(grandparent_data)
+                else:
+                    print(f"Nodo con métrica {metric_to_find} no encontrado.")
+            elif choice == "e":
+                metric_to_find = float(input("Ingrese la métrica1 del nodo para encontrar su tío: "))
+                uncle_data = self.find_uncle_of_node(metric_to_find)
+                if uncle_data is not None:
+                    print(f"El tío del nodo con métrica {metric_to_find} es:")
+                    print(uncle_data)
+                else:
+                    print(f"Nodo con métrica {metric_to_find} no encontrado.")
+            elif choice == "f":
+                break
+            else:
+                print("Opción no válida. Intente de nuevo.")
+
+    # Función generadora que recorre en orden las propiedades con métrica entre lo y hi usando una pila explícita;
+    # after (una métrica, o una tupla (métrica, property_id)) permite continuar después de lo último visto
+    # y limit corta el recorrido al llegar a ese número
+    def iter_range(self, lo=-math.inf, hi=math.inf, reverse=False, after=None, limit=None, criteria=None):
+        for key, row in self._iter_range_rows(lo, hi, reverse, after, limit, criteria):
+            yield key, self.store.get(row)
+
+    # Función auxiliar generadora que produce las tuplas (métrica, fila) de iter_range
+    def _iter_range_rows(self, lo, hi, reverse, after, limit, criteria):
+        after_key, after_row = after if isinstance(after, tuple) else (after, None)
+        if reverse:
+            near, far = 'right', 'left'
+            before_start = lambda key: key > hi or (after_key is not None and (key > after_key or (key == after_key and after_row is None)))
+            past_end = lambda key: key < lo
+        else:
+            near, far = 'left', 'right'
+            before_start = lambda key: key < lo or (after_key is not None and (key < after_key or (key == after_key and after_row is None)))
+            past_end = lambda key: key > hi
+
+        produced = 0
+        stack = []
+        node = self.root
+        while limit is None or produced < limit:
+            # Se descienden solo las ramas que pueden contener nodos del rango
+            while node:
+                if before_start(node.key):
+                    node = getattr(node, far)
+                else:
+                    stack.append(node)
+                    node = getattr(node, near)
+            if not stack:
+                return
+
+            node = stack.pop()
+            if past_end(node.key):
+                return
+
+            # Las filas de un nodo están en orden creciente, así el cursor se retoma aunque su fila ya no exista
+            rows = node.rows
+            if node.key == after_key and after_row is not None:
+                rows = rows[:bisect_left(rows, after_row)] if reverse else rows[bisect_right(rows, after_row):]
+            if reverse:
+                rows = rows[::-1]
+            for row in rows:
+                if criteria is None or self._meets_criteria(row, criteria):
+                    yield node.key, row
+                    produced += 1
+                    if limit is not None and produced >= limit:
+                        return
+            node = getattr(node, far)
+
+    # Función para obtener una página de resultados y el cursor (métrica, property_id) para pedir la siguiente
+    def page(self, lo=-math.inf, hi=math.inf, size=50, after=None, reverse=False, criteria=None):
+        entries = list(self._iter_range_rows(lo, hi, reverse, after, size, criteria))
+        cursor = entries[-1] if len(entries) == size else None
+        return [(key, self.store.get(row)) for key, row in entries], cursor
+
+    # Función para obtener las k propiedades con menor métrica del rango
+    def bottom_k(self, k, lo=-math.inf, hi=math.inf, criteria=None):
+        return list(self.iter_range(lo, hi, limit=k, criteria=criteria))
+
+    # Función para obtener las k propiedades con mayor métrica del rango
+    def top_k(self, k, lo=-math.inf, hi=math.inf, criteria=None):
+        return list(self.iter_range(lo, hi, reverse=True, limit=k, criteria=criteria))
+
+    # Función para contar las propiedades con métrica estrictamente menor a la dada
+    @instrumented('rank')
+    def rank(self, metric):
+        count = 0
+        node = self.root
+        while node:
+            if metric <= node.key:
+                node = node.left
+            else:
+                count += get_size(node.left) + len(node.rows)
+                node = node.right
+        return count
+
+    # Función para obtener la métrica de la k-ésima propiedad en orden (empezando en 0)
+    @instrumented('select')
+    def select(self, k):
+        if not 0 <= k < get_size(self.root):
+            return None
+
+        node = self.root
+        while node:
+            left_size = get_size(node.left)
+            if k < left_size:
+                node = node.left
+            elif k < left_size + len(node.rows):
+                return node.key
+            else:
+                k -= left_size + len(node.rows)
+                node = node.right
+
+    # Función para obtener el percentil p (entre 0 y 100) de la métrica
+    @instrumented('percentile')
+    def percentile(self, p):
+        size = get_size(self.root)
+        if size == 0 or not 0 <= p <= 100:
+            return None
+        return self.select(round(p / 100 * (size - 1)))
+
+    # Función para contar las propiedades con métrica entre lo y hi (inclusive)
+    @instrumented('count_range')
+    def count_range(self, lo, hi):
+        return self.aggregate_range(lo, hi)['count']
+
+    # Función para obtener el conteo, las sumas y los promedios de precio y superficie con métrica entre lo y hi
+    @instrumented('aggregate_range')
+    def aggregate_range(self, lo, hi):
+        count, sum_price, sum_surface = self._aggregate_range(lo, hi)
+        return {
+            'count': count,
+            'sum_price': sum_price,
+            'sum_surface': sum_surface,
+            'mean_price': sum_price / count if count else None,
+            'mean_surface': sum_surface / count if count else None,
+            'price_per_m2': sum_price / sum_surface if sum_surface else None,
+        }
+
+    # Función auxiliar que suma subárboles completos a lo largo de los dos bordes del rango
+    def _aggregate_range(self, lo, hi):
+        # Se desciende hasta el primer nodo cuya métrica queda dentro del rango
+        node = self.root
+        while node and not lo <= node.key <= hi:
+            node = node.left if hi < node.key else node.right
+        if not node:
+            return 0, 0.0, 0.0
+
+        totals = [0, 0.0, 0.0]
+        self._add_own(totals, node)
+
+        # Borde izquierdo: los nodos con métrica >= lo aportan también su subárbol derecho
+        current = node.left
+        while current:
+            if current.key >= lo:
+                self._add_own(totals, current)
+                self._add_subtree(totals, current.right)
+                current = current.left
+            else:
+                current = current.right
+
+        # Borde derecho: los nodos con métrica <= hi aportan también su subárbol izquierdo
+        current = node.right
+        while current:
+            if current.key <= hi:
+                self._add_own(totals, current)
+                self._add_subtree(totals, current.left)
+                current = current.right
+            else:
+                current = current.left
+
+        return tuple(totals)
+
+    # Funciones auxiliares para acumular los valores propios de un nodo o los de un subárbol completo
+    def _add_own(self, totals, node):
+        totals[0] += len(node.rows)
+        totals[1] += node.bucket_price
+        totals[2] += node.bucket_surface
+
+    @staticmethod
+    def _add_subtree(totals, node):
+        if node:
+            totals[0] += node.size
+            totals[1] += node.sum_price
+            totals[2] += node.sum_surface
+
+    # Función para verificar los invariantes del Árbol AVL: orden de las métricas, punteros al padre,
+    # alturas, factor de balanceo, tamaños, sumas y número de nodos; lanza ValueError con el primer error
+    def check_invariants(self):
+        if self.root and self.root.parent is not None:
+            raise ValueError("La raíz tiene padre")
+
+        count = 0
+        # Cada entrada es (nodo, cota inferior, cota superior, hijos ya revisados)
+        stack = [(self.root, -math.inf, math.inf, False)] if self.root else []
+        while stack:
+            node, lo, hi, children_done = stack.pop()
+            if not children_done:
+                if not lo < node.key < hi:
+                    raise ValueError(f"La métrica {node.key} está fuera del rango ({lo}, {hi})")
+                if not node.rows:
+                    raise ValueError(f"El nodo {node.key} no tiene propiedades")
+                if any(a >= b for a, b in zip(node.rows, node.rows[1:])):
+                    raise ValueError(f"Las filas del nodo {node.key} no están en orden creciente")
+                for child in (node.left, node.right):
+                    if child and child.parent is not node:
+                        raise ValueError(f"El hijo {child.key} no apunta a su padre {node.key}")
+                stack.append((node, lo, hi, True))
+                if node.left:
+                    stack.append((node.left, lo, node.key, False))
+                if node.right:
+                    stack.append((node.right, node.key, hi, False))
+                continue
+
+            count += 1
+            height = 1 + max(get_height(node.left), get_height(node.right))
+            if node.height != height:
+                raise ValueError(f"El nodo {node.key} tiene altura {node.height} y debería ser {height}")
+            if abs(get_balance_factor(node)) > 1:
+                raise ValueError(f"El nodo {node.key} tiene factor de balanceo {get_balance_factor(node)}")
+            if node.size != len(node.rows) + get_size(node.left) + get_size(node.right):
+                raise ValueError(f"El nodo {node.key} tiene un tamaño incorrecto")
+            totals = [0, 0.0, 0.0]
+            self._add_subtree(totals, node.left)
+            self._add_subtree(totals, node.right)
+            if not (math.isclose(node.sum_price, node.bucket_price + totals[1], rel_tol=1e-9)
+                    and math.isclose(node.sum_surface, node.bucket_surface + totals[2], rel_tol=1e-9)):
+                raise ValueError(f"El nodo {node.key} tiene sumas incorrectas")
+
+        if count != self.node_count:
+            raise ValueError(f"Hay {count} nodos y node_count es {self.node_count}")
+
+    # Función para obtener el nivel de un nodo dado su métrica1
+    @instrumented('get_node_level')
+    def get_node_level(self, metric):
+        node = self._find_node(metric)
+        if not node:
+            return None
+
+        level = 1
+        while node.parent:
+            node = node.parent
+            level += 1
+        return level
+
+    # Función para obtener el factor de balanceo de un nodo dado su métrica1
+    @instrumented('get_balance_factor_of_node')
+    def get_balance_factor_of_node(self, metric):
+        node = self._find_node(metric)
+        return get_balance_factor(node) if node else None
+
+    # Función para encontrar el padre de un nodo dado su métrica1
+    @instrumented('find_parent_of_node')
+    def find_parent_of_node(self, metric):
+        return self._relative_data(metric, self._parent)
+
+    # Función para encontrar el abuelo de un nodo dado su métrica1
+    @instrumented('find_grandparent_of_node')
+    def find_grandparent_of_node(self, metric):
+        return self._relative_data(metric, self._grandparent)
+
+    # Función para encontrar el tío de un nodo dado su métrica1
+    @instrumented('find_uncle_of_node')
+    def find_uncle_of_node(self, metric):
+        return self._relative_data(metric, self._uncle)
+
+    # Función para encontrar el hermano de un nodo dado su métrica1
+    @instrumented('find_sibling_of_node')
+    def find_sibling_of_node(self, metric):
+        return self._relative_data(metric, self._sibling)
+
+    # Función auxiliar que ubica el nodo una sola vez y sigue los enlaces hacia el pariente pedido
+    def _relative_data(self, metric, relative):
+        return self._cached((relative.__name__, metric), lambda: self._compute_relative_data(metric, relative))
+
+    # Función auxiliar que calcula el pariente sin pasar por la caché
+    def _compute_relative_data(self, metric, relative):
+        node = self._find_node(metric)
+        if not node:
+            return None
+        node = relative(node)
+        return self.store.get(node.rows[0]) if node else None
+
+    # Funciones auxiliares para recorrer los enlaces de parentesco de un nodo
+    @staticmethod
+    def _parent(node):
+        return node.parent
+
+    @staticmethod
+    def _grandparent(node):
+        return node.parent.parent if node.parent else None
+
+    @staticmethod
+    def _sibling(node):
+        parent = node.parent
+        if not parent:
+            return None
+        return parent.right if parent.left is node else parent.left
+
+    @staticmethod
+    def _uncle(node):
+        return AVLTree._sibling(node.parent) if node.parent else None
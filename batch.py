@@ -0,0 +1,84 @@
+# Modo por lotes: ejecuta operaciones escritas como JSON, una por línea, y escribe los resultados de una sola vez
+import json
+import math
+
+import numpy as np
+
+from avl_tree import AVLTree
+
+# Función para ejecutar una operación sobre el árbol y retornar su resultado como diccionario
+def execute(tree, operation):
+    if not isinstance(operation, dict):
+        raise ValueError("La operación debe ser un objeto JSON")
+    op = operation.get('op')
+    if op == 'insert':
+        # Las mismas reglas de la carga del CSV: precio finito y superficie finita mayor que 0
+        if not AVLTree._is_valid_property(operation['data']):
+            raise ValueError("La propiedad debe tener 'price' y 'surface_total' finitos, con superficie mayor que 0")
+        return {'property_id': tree.insert_property(operation['data'])}
+    if op == 'delete':
+        return {'removed': tree.delete_node_by_metric(_finite(operation, 'metric'), operation.get('property_id'))}
+    if op == 'delete_range':
+        return {'removed': tree.delete_range(_finite(operation, 'lo'), _finite(operation, 'hi'))}
+    if op == 'search':
+        return {'result': tree.search_properties_by_metric(_finite(operation, 'metric'))}
+    if op == 'criteria':
+        criteria = {'min_metric': -math.inf, 'max_metric': math.inf, **operation.get('criteria', {})}
+        return {'result': tree.search_nodes_by_criteria(criteria)}
+    if op == 'nearest':
+        found = tree.nearest(operation['lat'], operation['lon'], operation.get('k', 1), operation.get('criteria'))
+        return {'result': [{'distance_km': distance, 'property': data} for distance, data in found]}
+    if op == 'within_radius':
+        found = tree.within_radius(operation['lat'], operation['lon'], operation['radius_km'], operation.get('criteria'))
+        return {'result': [{'distance_km': distance, 'property': data} for distance, data in found]}
+    if op == 'within_bbox':
+        return {'result': tree.within_bbox(*operation['bbox'], operation.get('criteria'))}
+    if op in FAMILY_LOOKUPS:
+        return {'result': getattr(tree, FAMILY_LOOKUPS[op])(_finite(operation, 'metric'))}
+    if op == 'render':
+        return {'tree': tree.render_tree()}
+    raise ValueError(f"Operación no válida: {op!r}")
+
+# Operaciones de parentesco y el método del árbol que las resuelve
+FAMILY_LOOKUPS = {
+    'level': 'get_node_level',
+    'balance': 'get_balance_factor_of_node',
+    'parent': 'find_parent_of_node',
+    'grandparent': 'find_grandparent_of_node',
+    'uncle': 'find_uncle_of_node',
+    'sibling': 'find_sibling_of_node',
+}
+
+# Operaciones que modifican el árbol
+MUTATIONS = {'insert', 'delete', 'delete_range'}
+
+# Función para ejecutar todas las líneas de operaciones; los errores se reportan en la línea que los produjo
+def run_batch(tree, lines, output):
+    results = []
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        # Cualquier error (también OverflowError, AttributeError, etc.) se reporta en su línea y la ejecución sigue
+        try:
+            result = execute(tree, json.loads(line))
+        except Exception as error:
+            result = {'error': f"{type(error).__name__}: {error}"}
+        result['line'] = number
+        results.append(json.dumps(result, default=_json_default))
+
+    output.write('\n'.join(results) + ('\n' if results else ''))
+    return len(results)
+
+# Función auxiliar que obtiene un número finito de la operación; json.loads acepta NaN e Infinity, y una métrica
+# NaN no se puede comparar con las llaves del árbol (por ejemplo, un delete con NaN borraría la raíz)
+def _finite(operation, name):
+    value = operation[name]
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"'{name}' debe ser un número finito, no {value!r}")
+    return value
+
+# Función auxiliar para escribir en JSON los números de NumPy
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'{type(value).__name__} no se puede guardar en JSON')
@@ -0,0 +1,404 @@
+# Banco de pruebas de rendimiento del Árbol AVL con un generador de propiedades sintéticas.
+#
+#   python benchmark.py run --sizes 1000 10000 100000 --output resultados.json
+#   python benchmark.py compare base.json resultados.json --threshold 0.10
+#   python benchmark.py engines --sizes 100000 1000000
+#   python benchmark.py concurrent --rows 100000 --threads 8 --write-share 0.1
+import argparse
+import json
+import platform
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+# Ciudades del dataset con su departamento, su centro aproximado y cuántas propiedades tiene en co_properties_final.csv
+CITIES = [
+    ('Valle del Cauca', 'Cali', 3.406, -76.525, 34),
+    ('Cundinamarca', 'Bogotá D.C', 4.682, -74.057, 33),
+    ('Atlántico', 'Barranquilla', 10.997, -74.814, 20),
+    ('Antioquia', 'Medellín', 6.227, -75.586, 20),
+    ('Antioquia', 'Envigado', 6.175, -75.580, 6),
+    ('Santander', 'Bucaramanga', 7.118, -73.125, 4),
+    ('Cundinamarca', 'Chía', 4.862, -74.037, 4),
+    ('Antioquia', 'Sabaneta', 6.151, -75.608, 3),
+    ('Quindío', 'Armenia', 4.537, -75.689, 3),
+    ('Antioquia', 'Bello', 6.327, -75.552, 2),
+    ('Valle del Cauca', 'Jamundí', 3.273, -76.524, 2),
+    ('Valle del Cauca', 'Buenaventura', 3.915, -77.187, 2),
+    ('Cundinamarca', 'La Calera', 4.695, -73.982, 2),
+    ('Santander', 'Floridablanca', 7.069, -73.106, 2),
+    ('Magdalena', 'Santa Marta', 11.235, -74.211, 2),
+    ('Antioquia', 'Barbosa', 6.420, -75.418, 1),
+    ('Antioquia', 'La Estrella', 6.161, -75.641, 1),
+    ('Antioquia', 'Marinilla', 6.172, -75.338, 1),
+    ('Bolívar', 'Cartagena', 10.418, -75.534, 1),
+    ('Antioquia', 'Rionegro', 6.149, -75.372, 1),
+    ('Cundinamarca', 'Tabio', 4.926, -74.075, 1),
+    ('Cundinamarca', 'Fusagasugá', 4.325, -74.370, 1),
+    ('Cundinamarca', 'Cajicá', 4.914, -74.029, 1),
+    ('Cundinamarca', 'Sopó', 4.908, -73.940, 1),
+    ('Cundinamarca', 'Mosquera', 4.696, -74.231, 1),
+    ('Tolima', 'Ibagué', 4.454, -75.243, 1),
+]
+
+PROPERTY_TYPES = [('Apartamento', 98), ('Casa', 41), ('Local comercial', 3), ('Oficina', 3), ('Otro', 2), ('Finca', 2), ('Lote', 1)]
+
+# Media y desviación del logaritmo del precio por tipo de operación, y el redondeo típico de los precios publicados
+OPERATIONS = {
+    'Venta': (84, 20.09, 0.81, 1_000_000),
+    'Arriendo': (66, 14.40, 0.85, 100_000),
+}
+
+OPERATION_NAMES = ('insert', 'delete', 'search', 'criteria', 'parent', 'grandparent', 'uncle')
+
+# Función para generar n propiedades con el esquema y las distribuciones del CSV original;
+# los precios se redondean como en los avisos reales, lo que produce métricas repetidas
+def generate_properties(n, seed=0):
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+
+    city_weights = np.array([city[4] for city in CITIES], dtype=float)
+    cities = rng.choice(len(CITIES), size=n, p=city_weights / city_weights.sum())
+    type_weights = np.array([weight for _, weight in PROPERTY_TYPES], dtype=float)
+    types = rng.choice(len(PROPERTY_TYPES), size=n, p=type_weights / type_weights.sum())
+    operation_names = list(OPERATIONS)
+    operation_weights = np.array([OPERATIONS[name][0] for name in operation_names], dtype=float)
+    operations = rng.choice(len(operation_names), size=n, p=operation_weights / operation_weights.sum())
+
+    surface_total = np.clip(np.round(rng.lognormal(5.06, 1.24, size=n)), 20, 25_000)
+    covered_share = np.where(rng.random(n) < 0.74, 1.0, rng.uniform(0.5, 1.0, size=n))
+    bedrooms = np.clip(1 + rng.poisson(2.4, size=n), 1, 11).astype(float)
+    bathrooms = np.clip(bedrooms + rng.integers(-2, 2, size=n), 1, 9).astype(float)
+
+    price = np.empty(n)
+    for position, name in enumerate(operation_names):
+        selected = operations == position
+        _, mean, sigma, step = OPERATIONS[name]
+        price[selected] = np.maximum(step, np.round(rng.lognormal(mean, sigma, size=selected.sum()) / step) * step)
+
+    city_table = np.array([(lat, lon) for _, _, lat, lon, _ in CITIES])
+    latitude = np.round(city_table[cities, 0] + rng.normal(0, 0.03, size=n), 3)
+    longitude = np.round(city_table[cities, 1] + rng.normal(0, 0.03, size=n), 3)
+
+    department_names = np.array([city[0] for city in CITIES], dtype=object)
+    city_names = np.array([city[1] for city in CITIES], dtype=object)
+    type_names = np.array([name for name, _ in PROPERTY_TYPES], dtype=object)
+    operation_labels = np.array(operation_names, dtype=object)
+    codes = rng.integers(1000, 100_000, size=n)
+
+    return pd.DataFrame({
+        'title': [f"{kind} En {operation} En {city} Cod. S{code}" for kind, operation, city, code
+                  in zip(type_names[types], operation_labels[operations], city_names[cities], codes.tolist())],
+        'department': department_names[cities],
+        'city': city_names[cities],
+        'property_type': type_names[types],
+        'latitude': latitude,
+        'longitude': longitude,
+        'surface_total': surface_total,
+        'surface_covered': np.round(surface_total * covered_share),
+        'bedrooms': bedrooms,
+        'bathrooms': bathrooms,
+        'operation_type': operation_labels[operations],
+        'price': price,
+    })
+
+# Función para medir todas las operaciones sobre un árbol de n propiedades
+def run_size(n, seed=0, samples=1000):
+    from avl_tree import AVLTree
+
+    df = generate_properties(n + samples, seed)
+    base = df.iloc[:n]
+    extra = df.iloc[n:].to_dict('records')
+    rng = np.random.default_rng(seed + 1)
+
+    start = time.perf_counter()
+    tree = AVLTree.from_dataframe(base)
+    load_seconds = time.perf_counter() - start
+
+    metrics = (base['price'] / base['surface_total']).to_numpy()
+    probes = rng.choice(metrics, size=min(samples, n)).tolist()
+    cities = base['city'].to_numpy()
+    criteria = [
+        {
+            'city': cities[rng.integers(n)],
+            'bedrooms': int(rng.integers(0, 5)),
+            'price': float(np.quantile(base['price'], rng.uniform(0.2, 1.0))),
+            'min_metric': metric * 0.9,
+            'max_metric': metric * 1.1,
+        }
+        for metric in probes[:max(1, samples // 10)]
+    ]
+
+    operations = {}
+    inserted = []
+    operations['insert'] = _time_each(extra, lambda data: inserted.append((data['price'] / data['surface_total'], tree.insert_property(data))))
+    operations['delete'] = _time_each(inserted, lambda entry: tree.delete_node_by_metric(*entry))
+    operations['search'] = _time_each(probes, tree.search_node_by_metric)
+    operations['criteria'] = _time_each(criteria, tree.search_nodes_by_criteria)
+    operations['parent'] = _time_each(probes, tree.find_parent_of_node)
+    operations['grandparent'] = _time_each(probes, tree.find_grandparent_of_node)
+    operations['uncle'] = _time_each(probes, tree.find_uncle_of_node)
+
+    return {
+        'rows': n,
+        'load_seconds': load_seconds,
+        'load_rows_per_second': n / load_seconds if load_seconds > 0 else None,
+        'height': tree.root.height if tree.root else 0,
+        'peak_rss_bytes': _peak_rss_bytes(),
+        'operations': operations,
+    }
+
+# Función auxiliar que mide cada llamada por separado y resume la latencia en microsegundos
+def _time_each(items, operation):
+    timings = []
+    for item in items:
+        start = time.perf_counter()
+        operation(item)
+        timings.append(time.perf_counter() - start)
+
+    if not timings:
+        return {'count': 0}
+    timings = np.array(timings) * 1e6
+    return {
+        'count': len(timings),
+        'mean_us': float(timings.mean()),
+        'p50_us': float(np.percentile(timings, 50)),
+        'p99_us': float(np.percentile(timings, 99)),
+        'ops_per_second': float(1e6 / timings.mean()) if timings.mean() > 0 else None,
+    }
+
+# Función auxiliar para obtener el pico de memoria residente del proceso, si el sistema lo permite
+def _peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta kilobytes y macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+# Función para ejecutar el banco de pruebas; cada tamaño corre en un proceso nuevo para medir su memoria por separado
+def run(sizes, seed=0, samples=1000):
+    results = []
+    for n in sizes:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(run_size, n, seed, samples).result()
+        print(f"{n:>10} filas: carga {result['load_seconds']:.3f} s, altura {result['height']}", file=sys.stderr)
+        results.append(result)
+
+    return {
+        'meta': {
+            'seed': seed,
+            'samples': samples,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+# Función para comparar los motores AVL y B+ sobre las mismas propiedades: construcción, búsqueda puntual,
+# recorrido de rangos de métrica con criterios y memoria del índice (sin contar el almacén de columnas)
+def run_engine(n, engine, seed=0, samples=1000):
+    import tracemalloc
+
+    from avl_tree import PropertyStore, engine_class
+
+    df = generate_properties(n, seed)
+    rng = np.random.default_rng(seed + 1)
+    metrics = (df['price'] / df['surface_total']).to_numpy()
+    probes = rng.choice(metrics, size=samples).tolist()
+    cities = df['city'].to_numpy()
+    narrow = [{'min_metric': metric * 0.99, 'max_metric': metric * 1.01} for metric in probes[:samples // 10]]
+    wide = [{'city': cities[rng.integers(n)], 'bedrooms': 2, 'min_metric': metric * 0.8, 'max_metric': metric * 1.2}
+            for metric in probes[:samples // 10]]
+
+    start = time.perf_counter()
+    tree = engine_class(engine).from_dataframe(df)
+    load_seconds = time.perf_counter() - start
+    result = {
+        'engine': engine,
+        'rows': n,
+        'load_seconds': load_seconds,
+        'operations': {
+            'search': _time_each(probes, tree.search_node_by_metric),
+            'range_narrow': _time_each(narrow, tree.search_nodes_by_criteria),
+            'range_criteria': _time_each(wide, tree.search_nodes_by_criteria),
+            'count_range': _time_each(narrow, lambda criteria: tree.count_range(criteria['min_metric'], criteria['max_metric'])),
+        },
+    }
+    del tree
+
+    tracemalloc.start()
+    store = PropertyStore.from_dataframe(df)
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    del store
+    tracemalloc.stop()
+    tracemalloc.start()
+    tree = engine_class(engine).from_dataframe(df)
+    tree_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    result['index_bytes_per_property'] = (tree_bytes - store_bytes) / n
+    return result
+
+# Función para ejecutar la comparación de motores; cada medición corre en un proceso nuevo
+def run_engines(sizes, seed=0, samples=1000):
+    results = []
+    for n in sizes:
+        for engine in ('avl', 'bplus'):
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                result = executor.submit(run_engine, n, engine, seed, samples).result()
+            print(f"{n:>10} filas, {engine:>5}: carga {result['load_seconds']:.3f} s, "
+                  f"{result['index_bytes_per_property']:.0f} bytes por propiedad", file=sys.stderr)
+            results.append(result)
+    return {'seed': seed, 'samples': samples, 'results': results}
+
+# Función para medir el árbol persistente con varios hilos que mezclan búsquedas por criterios
+# e inserciones o eliminaciones; cada hilo hace sus operaciones durante el tiempo indicado
+def run_concurrent(n, threads=8, write_share=0.1, seconds=2.0, seed=0):
+    from persistent_avl import PersistentAVLTree
+
+    df = generate_properties(n + 10_000, seed)
+    base = df.iloc[:n]
+    extra = df.iloc[n:].to_dict('records')
+    tree = PersistentAVLTree.from_dataframe(base)
+
+    metrics = (base['price'] / base['surface_total']).to_numpy()
+    cities = base['city'].to_numpy()
+    rng = np.random.default_rng(seed + 1)
+    criteria = [
+        {
+            'city': cities[rng.integers(n)],
+            'bedrooms': int(rng.integers(0, 5)),
+            'min_metric': metric * 0.98,
+            'max_metric': metric * 1.02,
+        }
+        for metric in rng.choice(metrics, size=1000).tolist()
+    ]
+
+    deadline = time.perf_counter() + seconds
+    extra_lock = threading.Lock()
+
+    def worker(position):
+        local = np.random.default_rng(seed + 2 + position)
+        reads = writes = 0
+        inserted = []
+        while time.perf_counter() < deadline:
+            if local.random() >= write_share:
+                tree.snapshot().search_nodes_by_criteria(criteria[reads % len(criteria)])
+                reads += 1
+            elif inserted and local.random() < 0.5:
+                tree.delete_node_by_metric(*inserted.pop())
+                writes += 1
+            else:
+                with extra_lock:
+                    data = extra.pop() if extra else None
+                if data is None:
+                    continue
+                inserted.append((data['price'] / data['surface_total'], tree.insert_property(data)))
+                writes += 1
+        return reads, writes
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        counts = list(executor.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+
+    reads = sum(count[0] for count in counts)
+    writes = sum(count[1] for count in counts)
+    return {
+        'rows': n,
+        'threads': threads,
+        'write_share': write_share,
+        'seconds': elapsed,
+        'reads': reads,
+        'writes': writes,
+        'reads_per_second': reads / elapsed,
+        'writes_per_second': writes / elapsed,
+        'versions_published': tree.snapshot().number,
+        'height': tree.snapshot().height,
+    }
+
+# Función para comparar dos ejecuciones; retorna las filas de la comparación y si hubo regresiones
+def compare(baseline, current, threshold=0.10):
+    rows = []
+    regressions = False
+    base_by_size = {result['rows']: result for result in baseline['results']}
+    for result in current['results']:
+        base = base_by_size.get(result['rows'])
+        if base is None:
+            continue
+
+        pairs = [('load', base['load_seconds'], result['load_seconds'])]
+        for name in OPERATION_NAMES:
+            if base['operations'].get(name, {}).get('mean_us') and result['operations'].get(name, {}).get('mean_us'):
+                pairs.append((name, base['operations'][name]['mean_us'], result['operations'][name]['mean_us']))
+        if base.get('peak_rss_bytes') and result.get('peak_rss_bytes'):
+            pairs.append(('peak_rss', base['peak_rss_bytes'], result['peak_rss_bytes']))
+
+        for name, before, after in pairs:
+            change = after / before - 1
+            regressed = change > threshold
+            regressions = regressions or regressed
+            rows.append({'rows': result['rows'], 'metric': name, 'baseline': before, 'current': after,
+                         'change': change, 'regression': regressed})
+    return rows, regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banco de pruebas del Árbol AVL de propiedades")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="ejecuta el banco de pruebas y escribe los resultados en JSON")
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--samples', type=int, default=1000, help="operaciones medidas por tipo")
+    run_parser.add_argument('--output', help="archivo JSON de salida (por defecto la salida estándar)")
+
+    compare_parser = commands.add_parser('compare', help="compara una ejecución contra una línea base guardada")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.10, help="aumento relativo que cuenta como regresión")
+
+    engines_parser = commands.add_parser('engines', help="compara los motores AVL y B+")
+    engines_parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    engines_parser.add_argument('--seed', type=int, default=0)
+    engines_parser.add_argument('--samples', type=int, default=1000)
+
+    concurrent_parser = commands.add_parser('concurrent', help="mide lecturas y escrituras simultáneas sobre el árbol persistente")
+    concurrent_parser.add_argument('--rows', type=int, default=100_000)
+    concurrent_parser.add_argument('--threads', type=int, default=8)
+    concurrent_parser.add_argument('--write-share', type=float, default=0.1, help="fracción de operaciones que son escrituras")
+    concurrent_parser.add_argument('--seconds', type=float, default=2.0)
+    concurrent_parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args(argv)
+    if args.command == 'engines':
+        print(json.dumps(run_engines(args.sizes, args.seed, args.samples), indent=2))
+        return 0
+    if args.command == 'concurrent':
+        print(json.dumps(run_concurrent(args.rows, args.threads, args.write_share, args.seconds, args.seed), indent=2))
+        return 0
+    if args.command == 'run':
+        report = json.dumps(run(args.sizes, args.seed, args.samples), indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(report + '\n')
+        else:
+            print(report)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows, regressions = compare(baseline, current, args.threshold)
+    print(json.dumps({'comparison': rows, 'regressions': regressions}, indent=2))
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
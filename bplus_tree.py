@@ -0,0 +1,449 @@
+# Motor alternativo de índice: un Árbol B+ de alta ramificación con la misma interfaz que AVLTree.
+# Las hojas guardan las métricas y las filas en arreglos contiguos (array 'd' y 'q') y están enlazadas
+# para recorrer rangos; los nodos internos solo guardan separadores. Con cientos de entradas por nodo,
+# una búsqueda visita 3 o 4 nodos en lugar de ~20 objetos dispersos en memoria.
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from avl_tree import PropertyStore
+from instrumentation import instrumented
+
+# Máximo de entradas por hoja y de hijos por nodo interno
+LEAF_CAPACITY = 128
+INTERNAL_CAPACITY = 128
+# Al construir desde datos ordenados las hojas se llenan hasta esta fracción, para dejar espacio a inserciones
+BULK_FILL = 0.9
+
+# Clase para una hoja: métricas en orden (con repetidas) y la fila de cada una, con enlaces a sus vecinas
+class BPlusLeaf:
+    __slots__ = ('keys', 'rows', 'prev', 'next')
+
+    def __init__(self, keys=None, rows=None):
+        self.keys = keys if keys is not None else array('d')
+        self.rows = rows if rows is not None else array('q')
+        self.prev = None
+        self.next = None
+
+# Clase para un nodo interno: keys[i] es la primera métrica del hijo i + 1; las métricas iguales al separador
+# también pueden estar al final del hijo i
+class BPlusInternal:
+    __slots__ = ('keys', 'children')
+
+    def __init__(self, keys, children):
+        self.keys = keys
+        self.children = children
+
+# Clase para el Árbol B+ de propiedades indexado por la métrica price / surface_total
+class BPlusTree:
+    def __init__(self, store=None):
+        self.store = store if store is not None else PropertyStore()
+        self.root = BPlusLeaf()
+        self.height = 1
+        self.size = 0
+        self.version = 0
+        self.metrics = None
+
+    def __len__(self):
+        return self.size
+
+    # Función para construir el árbol a partir de un DataFrame ordenando una sola vez y llenando las hojas en orden
+    @classmethod
+    def from_dataframe(cls, df):
+        metrics = (df['price'] / df['surface_total']).to_numpy(dtype=float)
+        order = np.argsort(metrics, kind='stable')
+        return cls._from_sorted(metrics[order], order, PropertyStore.from_dataframe(df))
+
+    # Función para construir el árbol a partir de una secuencia de diccionarios
+    @classmethod
+    def from_records(cls, records):
+        store = PropertyStore()
+        keys = []
+        for property_data in records:
+            keys.append(property_data['price'] / property_data['surface_total'])
+            store.append(property_data)
+        metrics = np.array(keys, dtype=float)
+        order = np.argsort(metrics, kind='stable')
+        return cls._from_sorted(metrics[order], order, store)
+
+    # Función auxiliar que arma las hojas con bloques de los arreglos ordenados y luego cada nivel interno
+    @classmethod
+    def _from_sorted(cls, keys, rows, store):
+        tree = cls(store)
+        if len(keys) == 0:
+            return tree
+
+        step = max(1, int(LEAF_CAPACITY * BULK_FILL))
+        keys = keys.astype(np.float64)
+        rows = rows.astype(np.int64)
+        level = []
+        for start in range(0, len(keys), step):
+            leaf = BPlusLeaf(array('d', keys[start:start + step].tobytes()), array('q', rows[start:start + step].tobytes()))
+            if level:
+                level[-1].next = leaf
+                leaf.prev = level[-1]
+            level.append(leaf)
+        firsts = [leaf.keys[0] for leaf in level]
+
+        height = 1
+        fanout = max(2, int(INTERNAL_CAPACITY * BULK_FILL))
+        while len(level) > 1:
+            parents = []
+            parent_firsts = []
+            for start in range(0, len(level), fanout):
+                parents.append(BPlusInternal(array('d', firsts[start + 1:start + fanout]), level[start:start + fanout]))
+                parent_firsts.append(firsts[start])
+            level = parents
+            firsts = parent_firsts
+            height += 1
+
+        tree.root = level[0]
+        tree.height = height
+        tree.size = len(keys)
+        return tree
+
+    # Función para insertar una propiedad; retorna su identificador
+    @instrumented('insert_property')
+    def insert_property(self, property_data):
+        metric1 = property_data['price'] / property_data['surface_total']
+        row = self.store.append(property_data)
+        self._insert(metric1, row)
+        return row
+
+    # Función para insertar una propiedad con una métrica dada
+    @instrumented('insert')
+    def insert(self, key, data):
+        row = self.store.append(data)
+        self._insert(key, row)
+        return row
+
+    # Función auxiliar que inserta después de las propiedades con la misma métrica y divide los nodos llenos
+    def _insert(self, key, row):
+        self.version += 1
+        self.size += 1
+        path = []
+        node = self.root
+        while isinstance(node, BPlusInternal):
+            position = bisect_right(node.keys, key)
+            path.append((node, position))
+            node = node.children[position]
+
+        position = bisect_right(node.keys, key)
+        node.keys.insert(position, key)
+        node.rows.insert(position, row)
+        if len(node.keys) <= LEAF_CAPACITY:
+            return
+
+        # La hoja se divide a la mitad y el separador sube; se repite mientras el padre quede lleno
+        middle = len(node.keys) // 2
+        right = BPlusLeaf(node.keys[middle:], node.rows[middle:])
+        del node.keys[middle:]
+        del node.rows[middle:]
+        right.next = node.next
+        right.prev = node
+        if node.next:
+            node.next.prev = right
+        node.next = right
+        separator = right.keys[0]
+
+        while path:
+            parent, position = path.pop()
+            parent.keys.insert(position, separator)
+            parent.children.insert(position + 1, right)
+            if len(parent.children) <= INTERNAL_CAPACITY:
+                return
+            middle = len(parent.children) // 2
+            separator = parent.keys[middle - 1]
+            right = BPlusInternal(parent.keys[middle:], parent.children[middle:])
+            del parent.keys[middle - 1:]
+            del parent.children[middle:]
+            node = parent
+
+        self.root = BPlusInternal(array('d', [separator]), [node, right])
+        self.height += 1
+
+    # Función para eliminar por métrica todas las propiedades, o solo la indicada por property_id;
+    # retorna el número de propiedades eliminadas
+    @instrumented('delete_node_by_metric')
+    def delete_node_by_metric(self, metric, property_id=None):
+        removed = 0
+        # Las propiedades con la métrica pueden ocupar varias hojas; se elimina hoja por hoja
+        while (target := self._find_entries(metric, property_id)) is not None:
+            leaf, start, end = target
+            path = self._path_to(leaf)
+            del leaf.keys[start:end]
+            del leaf.rows[start:end]
+            removed += end - start
+            self._fix_leaf(leaf, path)
+            if property_id is not None:
+                break
+
+        if removed:
+            self.version += 1
+            self.size -= removed
+        return removed
+
+    # Función auxiliar que ubica la primera hoja con la métrica (o con la propiedad indicada);
+    # retorna la hoja y el rango de posiciones a eliminar
+    def _find_entries(self, metric, property_id):
+        for leaf, position, end in self._leaf_slices(metric, metric):
+            if property_id is None:
+                return leaf, position, end
+            for index in range(position, end):
+                if leaf.rows[index] == property_id:
+                    return leaf, index, index + 1
+        return None
+
+    # Función auxiliar que une una hoja con poco contenido a su vecina, o la quita si quedó vacía
+    def _fix_leaf(self, leaf, path):
+        if not path:
+            return
+        parent, position = path[-1]
+        if leaf.keys and len(leaf.keys) >= LEAF_CAPACITY // 4:
+            return
+
+        if leaf.keys:
+            # Se une con la hoja vecina del mismo padre si ambas caben en una sola
+            if position + 1 < len(parent.children) and len(leaf.keys) + len(parent.children[position + 1].keys) <= LEAF_CAPACITY:
+                right = parent.children[position + 1]
+                leaf.keys.extend(right.keys)
+                leaf.rows.extend(right.rows)
+                self._unlink_leaf(right)
+                self._remove_child(path, position + 1)
+            elif position > 0 and len(leaf.keys) + len(parent.children[position - 1].keys) <= LEAF_CAPACITY:
+                left = parent.children[position - 1]
+                left.keys.extend(leaf.keys)
+                left.rows.extend(leaf.rows)
+                self._unlink_leaf(leaf)
+                self._remove_child(path, position)
+            return
+
+        self._unlink_leaf(leaf)
+        self._remove_child(path, position)
+
+    # Función auxiliar que quita un hijo de un nodo interno; los nodos internos vacíos se quitan de su padre
+    # y la raíz con un solo hijo se reemplaza por ese hijo
+    def _remove_child(self, path, position):
+        path = list(path)
+        while path:
+            parent, _ = path.pop()
+            del parent.children[position]
+            if parent.keys:
+                del parent.keys[max(0, position - 1)]
+            if parent.children:
+                break
+            if path:
+                position = path[-1][1]
+
+        while isinstance(self.root, BPlusInternal) and len(self.root.children) == 1:
+            self.root = self.root.children[0]
+            self.height -= 1
+        if isinstance(self.root, BPlusInternal) and not self.root.children:
+            self.root = BPlusLeaf()
+            self.height = 1
+
+    # Función auxiliar que saca una hoja de la lista enlazada
+    @staticmethod
+    def _unlink_leaf(leaf):
+        if leaf.prev:
+            leaf.prev.next = leaf.next
+        if leaf.next:
+            leaf.next.prev = leaf.prev
+        leaf.prev = leaf.next = None
+
+    # Función auxiliar que desciende hasta la primera posición con la métrica; retorna el camino, la hoja y la posición
+    def _locate(self, metric):
+        path = []
+        node = self.root
+        while isinstance(node, BPlusInternal):
+            position = bisect_left(node.keys, metric)
+            path.append((node, position))
+            node = node.children[position]
+        return path, node, bisect_left(node.keys, metric)
+
+    # Función auxiliar que reconstruye el camino hasta una hoja no vacía; con métricas repetidas entre hojas
+    # se revisan solo los hijos cuyo rango incluye la primera métrica de la hoja
+    def _path_to(self, leaf):
+        metric = leaf.keys[0]
+        stack = [(self.root, [])]
+        while stack:
+            node, path = stack.pop()
+            if node is leaf:
+                return path
+            if isinstance(node, BPlusInternal):
+                for position in range(bisect_right(node.keys, metric), bisect_left(node.keys, metric) - 1, -1):
+                    stack.append((node.children[position], path + [(node, position)]))
+        return None
+
+    # Función auxiliar que recorre las entradas (métrica, fila) con métrica entre lo y hi, hoja por hoja
+    def _leaf_slices(self, lo, hi):
+        _, leaf, position = self._locate(lo)
+        while leaf:
+            end = bisect_right(leaf.keys, hi, position)
+            if end > position:
+                yield leaf, position, end
+            if end < len(leaf.keys):
+                return
+            leaf = leaf.next
+            position = 0
+
+    # Función auxiliar como _leaf_slices pero de la última hoja a la primera; se desciende por el último hijo
+    # cuyo separador es menor o igual a hi, porque los hijos siguientes solo tienen métricas mayores
+    def _leaf_slices_reverse(self, lo, hi):
+        node = self.root
+        while isinstance(node, BPlusInternal):
+            node = node.children[bisect_right(node.keys, hi)]
+        leaf = node
+        end = bisect_right(leaf.keys, hi)
+        while leaf:
+            position = bisect_left(leaf.keys, lo, 0, end)
+            if end > position:
+                yield leaf, position, end
+            if position > 0:
+                return
+            leaf = leaf.prev
+            end = len(leaf.keys) if leaf else 0
+
+    # Función para buscar la primera propiedad con una métrica
+    @instrumented('search_node_by_metric')
+    def search_node_by_metric(self, metric):
+        for leaf, position, _ in self._leaf_slices(metric, metric):
+            return self.store.get(leaf.rows[position])
+        return None
+
+    # Función para obtener todas las propiedades con una métrica, indexadas por su identificador
+    @instrumented('search_properties_by_metric')
+    def search_properties_by_metric(self, metric):
+        return {row: self.store.get(row)
+                for leaf, position, end in self._leaf_slices(metric, metric)
+                for row in leaf.rows[position:end]}
+
+    # Función para buscar las propiedades que cumplan los criterios; cada hoja del rango de métricas
+    # se filtra de una vez con PropertyStore.criteria_mask
+    @instrumented('search_nodes_by_criteria')
+    def search_nodes_by_criteria(self, criteria):
+        filters = {name: value for name, value in criteria.items() if name not in ('min_metric', 'max_metric')}
+        result = []
+        for leaf, position, end in self._leaf_slices(criteria.get('min_metric', -math.inf), criteria.get('max_metric', math.inf)):
+            rows = np.frombuffer(leaf.rows, dtype=np.int64)[position:end]
+            if filters:
+                rows = rows[self.store.criteria_mask(rows, filters)]
+            result.extend(self.store.get(row) for row in rows.tolist())
+        return result
+
+    # Función generadora que recorre en orden las propiedades con métrica entre lo y hi, como AVLTree.iter_range:
+    # reverse recorre de mayor a menor y after (una métrica o un cursor (métrica, property_id)) continúa
+    # después de esa posición. Entre métricas iguales las filas están en orden de inserción
+    def iter_range(self, lo=-math.inf, hi=math.inf, reverse=False, after=None, limit=None, criteria=None):
+        after_key, after_row = after if isinstance(after, tuple) else (after, None)
+        if after_key is not None:
+            if reverse:
+                hi = min(hi, after_key)
+            else:
+                lo = max(lo, after_key)
+
+        produced = 0
+        slices = self._leaf_slices_reverse(lo, hi) if reverse else self._leaf_slices(lo, hi)
+        for leaf, position, end in slices:
+            keys = leaf.keys[position:end]
+            rows = leaf.rows[position:end]
+            entries = zip(reversed(keys), reversed(rows)) if reverse else zip(keys, rows)
+            for key, row in entries:
+                if key == after_key and (after_row is None or (row >= after_row if reverse else row <= after_row)):
+                    continue
+                if criteria is None or self.store.meets_criteria(row, criteria):
+                    if limit is not None and produced >= limit:
+                        return
+                    yield key, self.store.get(row)
+                    produced += 1
+
+    # Función para eliminar todas las propiedades con métrica entre lo y hi (inclusive), hoja por hoja;
+    # retorna el número de propiedades eliminadas
+    @instrumented('delete_range')
+    def delete_range(self, lo, hi):
+        removed = 0
+        while (target := next(self._leaf_slices(lo, hi), None)) is not None:
+            leaf, start, end = target
+            path = self._path_to(leaf)
+            del leaf.keys[start:end]
+            del leaf.rows[start:end]
+            removed += end - start
+            self._fix_leaf(leaf, path)
+
+        if removed:
+            self.version += 1
+            self.size -= removed
+        return removed
+
+    # Función para contar las propiedades con métrica entre lo y hi (inclusive)
+    @instrumented('count_range')
+    def count_range(self, lo, hi):
+        return sum(end - position for _, position, end in self._leaf_slices(lo, hi))
+
+    # Función para obtener el nivel de la hoja que tiene una métrica; todas las hojas están al mismo nivel
+    @instrumented('get_node_level')
+    def get_node_level(self, metric):
+        return self.height if self.search_node_by_metric(metric) is not None else None
+
+    # Función para obtener el factor de balanceo: un Árbol B+ siempre tiene todas sus hojas a la misma altura
+    @instrumented('get_balance_factor_of_node')
+    def get_balance_factor_of_node(self, metric):
+        return 0 if self.search_node_by_metric(metric) is not None else None
+
+    # En un Árbol B+ las métricas no son nodos con padre, abuelo, tío o hermano
+    def find_parent_of_node(self, metric):
+        raise ValueError("El motor B+ no tiene relaciones de parentesco entre métricas")
+
+    find_grandparent_of_node = find_uncle_of_node = find_sibling_of_node = find_parent_of_node
+
+    # Función para obtener como texto el dibujo del Árbol B+: cada nodo interno muestra sus separadores
+    # y cada hoja el rango de métricas que guarda y cuántas propiedades tiene
+    def render_tree(self):
+        from anytree import RenderTree
+
+        if self.size == 0:
+            return ''
+        return '\n'.join(f"{pre}{node.name}" for pre, fill, node in RenderTree(self._convert_to_anytree(self.root)))
+
+    # Función auxiliar que convierte un nodo del Árbol B+ a un nodo de AnyTree
+    def _convert_to_anytree(self, node):
+        from anytree import Node
+
+        if isinstance(node, BPlusLeaf):
+            return Node(f"Hoja: {node.keys[0]} .. {node.keys[-1]}, {len(node.keys)} propiedades" if node.keys else "Hoja vacía")
+        new_node = Node(f"Separadores: {list(node.keys)}")
+        new_node.children = [self._convert_to_anytree(child) for child in node.children]
+        return new_node
+
+    # Función para verificar los invariantes: orden de las métricas, separadores, hojas a la misma altura,
+    # capacidad de los nodos, enlaces entre hojas y número de propiedades; lanza ValueError con el primer error
+    def check_invariants(self):
+        leaves = []
+        stack = [(self.root, 1, -math.inf, math.inf)]
+        while stack:
+            node, depth, lo, hi = stack.pop()
+            if isinstance(node, BPlusInternal):
+                if len(node.keys) != len(node.children) - 1 or len(node.children) > INTERNAL_CAPACITY:
+                    raise ValueError("Un nodo interno tiene un número inválido de separadores o hijos")
+                bounds = [lo, *node.keys, hi]
+                for index in range(len(node.children) - 1, -1, -1):
+                    stack.append((node.children[index], depth + 1, bounds[index], bounds[index + 1]))
+                continue
+
+            if depth != self.height:
+                raise ValueError(f"Hay una hoja en el nivel {depth} y la altura es {self.height}")
+            if len(node.keys) != len(node.rows) or len(node.keys) > LEAF_CAPACITY:
+                raise ValueError("Una hoja tiene un número inválido de entradas")
+            if any(node.keys[i] > node.keys[i + 1] for i in range(len(node.keys) - 1)):
+                raise ValueError("Una hoja tiene las métricas desordenadas")
+            if node.keys and not (lo <= node.keys[0] and node.keys[-1] <= hi):
+                raise ValueError(f"Una hoja tiene métricas fuera del rango [{lo}, {hi}]")
+            leaves.append(node)
+
+        for left, right in zip(leaves, leaves[1:]):
+            if left.next is not right or right.prev is not left:
+                raise ValueError("Los enlaces entre hojas no siguen el orden del árbol")
+        if sum(len(leaf.keys) for leaf in leaves) != self.size:
+            raise ValueError("El número de propiedades no coincide con el de las hojas")
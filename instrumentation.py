@@ -0,0 +1,143 @@
+# Métricas opcionales del Árbol AVL: contadores, histogramas de latencia y exportación a diccionario o texto de Prometheus
+import math
+import time
+from bisect import bisect_left
+from functools import wraps
+
+# Límites de los histogramas de latencia (segundos) y de nodos visitados por búsqueda
+LATENCY_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0, 5.0)
+VISITED_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+# Clase para un histograma acumulativo con límites fijos, al estilo de Prometheus
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    # Función para registrar una observación
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    # Función para obtener los conteos acumulados por límite, incluyendo +Inf
+    def cumulative(self):
+        running = 0
+        buckets = []
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            running += count
+            buckets.append((bound, running))
+        return buckets
+
+    def as_dict(self):
+        return {
+            'count': self.total,
+            'sum': self.sum,
+            'buckets': {('+Inf' if bound == math.inf else repr(bound)): count for bound, count in self.cumulative()},
+        }
+
+# Clase con los contadores y los histogramas de un árbol
+class TreeMetrics:
+    def __init__(self, tree):
+        self.tree = tree
+        self.comparisons = 0
+        self.single_rotations = 0
+        self.double_rotations = 0
+        # Rotaciones pedidas sobre un nodo sin el hijo necesario, que no cambian el árbol
+        self.noop_rotations = 0
+        self.criteria_searches = 0
+        self.criteria_nodes_visited = 0
+        self.criteria_rows_filtered = 0
+        self.visited_per_search = Histogram(VISITED_BUCKETS)
+        self.latency = {}
+
+    # Función para registrar la duración de una operación pública
+    def observe_latency(self, operation, seconds):
+        histogram = self.latency.get(operation)
+        if histogram is None:
+            histogram = self.latency[operation] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(seconds)
+
+    # Función para registrar el trabajo de una búsqueda por criterios
+    def observe_criteria(self, visited, filtered):
+        self.criteria_searches += 1
+        self.criteria_nodes_visited += visited
+        self.criteria_rows_filtered += filtered
+        self.visited_per_search.observe(visited)
+
+    # Función para obtener la altura actual y la cota teórica de un Árbol AVL con el mismo número de nodos
+    def height_report(self):
+        nodes = self.tree.node_count
+        height = self.tree.root.height if self.tree.root else 0
+        bound = 1.4405 * math.log2(nodes + 2) - 0.3277 if nodes else 0.0
+        return {
+            'height': height,
+            'nodes': nodes,
+            'properties': self.tree.root.size if self.tree.root else 0,
+            'avl_height_bound': bound,
+            'height_within_bound': height <= math.floor(bound) if nodes else True,
+        }
+
+    # Función para exportar todas las métricas como diccionario
+    def as_dict(self):
+        return {
+            'counters': {
+                'comparisons': self.comparisons,
+                'single_rotations': self.single_rotations,
+                'double_rotations': self.double_rotations,
+                'noop_rotations': self.noop_rotations,
+                'criteria_searches': self.criteria_searches,
+                'criteria_nodes_visited': self.criteria_nodes_visited,
+                'criteria_rows_filtered': self.criteria_rows_filtered,
+            },
+            'gauges': self.height_report(),
+            'criteria_nodes_visited_per_search': self.visited_per_search.as_dict(),
+            'latency_seconds': {operation: histogram.as_dict() for operation, histogram in self.latency.items()},
+        }
+
+    # Función para exportar todas las métricas en el formato de texto de Prometheus
+    def to_prometheus(self, prefix='avl_tree'):
+        data = self.as_dict()
+        lines = []
+        for name, value in data['counters'].items():
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            lines.append(f'{prefix}_{name}_total {value}')
+        for name, value in data['gauges'].items():
+            lines.append(f'# TYPE {prefix}_{name} gauge')
+            lines.append(f'{prefix}_{name} {float(value)}')
+
+        lines.append(f'# TYPE {prefix}_criteria_nodes_visited histogram')
+        lines.extend(self._histogram_lines(f'{prefix}_criteria_nodes_visited', self.visited_per_search, ''))
+        lines.append(f'# TYPE {prefix}_operation_latency_seconds histogram')
+        for operation, histogram in sorted(self.latency.items()):
+            lines.extend(self._histogram_lines(f'{prefix}_operation_latency_seconds', histogram, f'operation="{operation}",'))
+        return '\n'.join(lines) + '\n'
+
+    # Función auxiliar que escribe las líneas _bucket, _sum y _count de un histograma
+    @staticmethod
+    def _histogram_lines(name, histogram, labels):
+        lines = [
+            f'{name}_bucket{{{labels}le="{"+Inf" if bound == math.inf else bound}"}} {count}'
+            for bound, count in histogram.cumulative()
+        ]
+        label_block = f'{{{labels.rstrip(",")}}}' if labels else ''
+        lines.append(f'{name}_sum{label_block} {histogram.sum}')
+        lines.append(f'{name}_count{label_block} {histogram.total}')
+        return lines
+
+# Decorador que mide la latencia de una operación pública solo cuando el árbol tiene métricas activas
+def instrumented(operation):
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self.metrics is None:
+                return method(self, *args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.metrics.observe_latency(operation, time.perf_counter() - start)
+        return wrapper
+    return decorator
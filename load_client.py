@@ -0,0 +1,138 @@
+# Generador de carga para server.py: abre varias conexiones que envían operaciones mezcladas
+# y reporta la latencia p50/p99 y las peticiones por segundo.
+#
+#   python load_client.py --port 8765 --connections 32 --requests 20000 --write-share 0.05
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+
+import numpy as np
+
+from benchmark import CITIES, generate_properties
+
+# Clase para una conexión del cliente; varias peticiones pueden esperar respuesta a la vez
+class Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count()
+        self.waiting = {}
+        self.listener = asyncio.create_task(self._listen())
+
+    @classmethod
+    async def open(cls, host, port, socket_path=None):
+        if socket_path:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    # Función para enviar una operación y esperar su respuesta
+    async def request(self, operation):
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[request_id] = future
+        self.writer.write((json.dumps({**operation, 'id': request_id}) + '\n').encode())
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        self.listener.cancel()
+
+    # Función auxiliar que reparte las respuestas según su "id"
+    async def _listen(self):
+        while line := await self.reader.readline():
+            response = json.loads(line)
+            future = self.waiting.pop(response.get('id'), None)
+            if future and not future.done():
+                future.set_result(response)
+
+# Función para ejecutar la carga; retorna el resumen de latencias y peticiones por segundo
+async def run_load(host='127.0.0.1', port=8765, socket_path=None, connections=32, requests=20_000,
+                   write_share=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+    connection_list = [await Connection.open(host, port, socket_path) for _ in range(connections)]
+
+    # Se toman métricas reales del servidor para que las búsquedas encuentren nodos
+    sample = await connection_list[0].request({'op': 'criteria', 'criteria': {'city': 'Cali'}})
+    metrics = [data['price'] / data['surface_total'] for data in sample.get('result', []) if data.get('surface_total')]
+    metrics = metrics or [1.0]
+    new_properties = iter(generate_properties(requests, seed).to_dict('records'))
+    city_names = [city[1] for city in CITIES]
+
+    def next_operation(inserted):
+        draw = rng.random()
+        if draw < write_share:
+            if inserted and rng.random() < 0.5:
+                metric, property_id = inserted.pop()
+                return {'op': 'delete', 'metric': metric, 'property_id': property_id}, None
+            data = next(new_properties)
+            return {'op': 'insert', 'data': data}, data['price'] / data['surface_total']
+        metric = metrics[rng.integers(len(metrics))]
+        if draw < 0.5:
+            return {'op': 'search', 'metric': metric}, None
+        if draw < 0.8:
+            return {'op': ('parent', 'grandparent', 'uncle')[rng.integers(3)], 'metric': metric}, None
+        return {'op': 'criteria', 'criteria': {
+            'city': city_names[rng.integers(len(city_names))],
+            'bedrooms': int(rng.integers(0, 5)),
+            'min_metric': metric * 0.9,
+            'max_metric': metric * 1.1,
+        }}, None
+
+    latencies = []
+    errors = 0
+    remaining = itertools.count()
+
+    async def worker(connection):
+        nonlocal errors
+        inserted = []
+        while next(remaining) < requests:
+            operation, metric = next_operation(inserted)
+            start = time.perf_counter()
+            response = await connection.request(operation)
+            latencies.append(time.perf_counter() - start)
+            if 'error' in response:
+                errors += 1
+            elif metric is not None:
+                inserted.append((metric, response['property_id']))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(connection) for connection in connection_list))
+    elapsed = time.perf_counter() - start
+    for connection in connection_list:
+        await connection.close()
+
+    timings = np.array(latencies) * 1e3
+    return {
+        'connections': connections,
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p99_ms': float(np.percentile(timings, 99)),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generador de carga para el servidor del Árbol AVL")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', help="ruta de un socket Unix en lugar de TCP")
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=20_000)
+    parser.add_argument('--write-share', type=float, default=0.05, help="fracción de peticiones que son escrituras")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_load(args.host, args.port, args.socket, args.connections, args.requests,
+                                  args.write_share, args.seed))
+    print(json.dumps(report, indent=2))
+    return 1 if report['errors'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
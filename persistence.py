@@ -0,0 +1,234 @@
+# Persistencia del Árbol AVL: copia binaria en arreglos .npy y registro de operaciones
+import json
+import os
+import shutil
+from contextlib import contextmanager
+
+import numpy as np
+
+from avl_tree import AVLTree, PropertyStore
+
+# Clase para guardar el árbol en disco: una copia binaria en arreglos .npy (leída con mmap) y un registro
+# de operaciones que se agrega al final con cada inserción o eliminación y se reproduce al abrir
+class TreePersistence:
+    def __init__(self, directory, compact_every=10_000, sync=False):
+        self.directory = directory
+        self.compact_every = compact_every
+        self.sync = sync
+        self.generation = 0
+        self.pending = 0
+        self.tree = None
+        self.log = None
+        # Mientras es mayor que cero, record no vacía el registro en cada operación (ver group)
+        self.grouping = 0
+
+    # Función para abrir el árbol: carga la última copia y reproduce el registro;
+    # si todavía no existe una copia, construye el árbol desde el CSV y la escribe
+    def open(self, csv_path=None):
+        os.makedirs(self.directory, exist_ok=True)
+        current = os.path.join(self.directory, 'CURRENT')
+        if os.path.exists(current):
+            with open(current) as f:
+                self.generation = int(f.read())
+            tree = self.read_snapshot(self._snapshot_path(self.generation))
+            self.pending = self._replay(tree, self._log_path(self.generation))
+        else:
+            tree = AVLTree()
+            if csv_path:
+                tree.load_csv(csv_path)
+            self._write_generation(tree, 0)
+
+        self._attach(tree)
+        if self.pending >= self.compact_every:
+            self.compact()
+        return tree
+
+    # Función que recibe cada operación del árbol, la agrega al registro y compacta cuando se acumulan muchas
+    def record(self, operation):
+        self.log.write(json.dumps(operation, default=self._json_default) + '\n')
+        if not self.grouping:
+            self._flush()
+
+        # Dentro de un grupo la compactación espera al final del grupo, porque descartaría del almacén filas que
+        # una operación en curso (p. ej. union) todavía no enlazó al árbol
+        self.pending += 1
+        if self.pending >= self.compact_every and not self.grouping:
+            self.compact()
+
+    # Función para agrupar las operaciones de un bloque en una sola escritura a disco (y un solo fsync)
+    @contextmanager
+    def group(self):
+        self.grouping += 1
+        try:
+            yield
+        finally:
+            self.grouping -= 1
+            if not self.grouping and self.log:
+                self._flush()
+                if self.pending >= self.compact_every:
+                    self.compact()
+
+    # Función para escribir una copia nueva con el estado actual, para cambios que no pasan por el registro
+    # (p. ej. load_csv); dentro de un grupo se escribe al terminar el grupo
+    def checkpoint(self):
+        if self.grouping:
+            self.pending = max(self.pending, self.compact_every)
+        else:
+            self.compact()
+
+    # Función auxiliar que vacía el registro y, si se pidió, lo sincroniza con el disco
+    def _flush(self):
+        self.log.flush()
+        if self.sync:
+            os.fsync(self.log.fileno())
+
+    # Función para escribir una copia nueva con el estado actual y empezar un registro vacío; antes se descartan
+    # del almacén las filas eliminadas (las propiedades vigentes conservan su property_id)
+    def compact(self):
+        self.log.close()
+        self.tree.compact_store()
+        previous = self.generation
+        self._write_generation(self.tree, previous + 1)
+        self.pending = 0
+        self.log = open(self._log_path(self.generation), 'a')
+
+        shutil.rmtree(self._snapshot_path(previous), ignore_errors=True)
+        if os.path.exists(self._log_path(previous)):
+            os.remove(self._log_path(previous))
+
+    # Función para cerrar el registro de operaciones
+    def close(self):
+        if self.log:
+            self.log.close()
+            self.log = None
+        if self.tree:
+            self.tree.journal = None
+
+    # Función para escribir la copia binaria: métricas en orden, filas de cada nodo y columnas del almacén
+    @staticmethod
+    def write_snapshot(tree, path):
+        os.makedirs(path, exist_ok=True)
+        keys = []
+        bucket_sizes = []
+        rows = []
+        for node in tree._inorder_nodes():
+            keys.append(node.key)
+            bucket_sizes.append(len(node.rows))
+            rows.extend(node.rows)
+
+        np.save(os.path.join(path, 'keys.npy'), np.array(keys, dtype=float))
+        np.save(os.path.join(path, 'offsets.npy'), np.concatenate([[0], np.cumsum(bucket_sizes, dtype=np.int64)]))
+        np.save(os.path.join(path, 'rows.npy'), np.array(rows, dtype=np.int64))
+        # Identificadores de las filas guardadas después de una compactación (ver PropertyStore)
+        np.save(os.path.join(path, 'ids.npy'), tree.store.ids)
+
+        # Las columnas de texto se guardan tal como están en memoria: códigos enteros y un vocabulario
+        store = tree.store
+        columns = []
+        for position, (name, column) in enumerate(store.columns.items()):
+            file_name = f'column_{position}.npy'
+            if name in store.numeric:
+                np.save(os.path.join(path, file_name), column[:store.size])
+                columns.append({'name': name, 'file': file_name, 'numeric': True})
+            else:
+                np.save(os.path.join(path, file_name), column[:store.size])
+                columns.append({'name': name, 'file': file_name, 'numeric': False,
+                                'vocabulary': store.vocabularies[name]})
+
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'size': store.size, 'tail_id': store.tail_id, 'columns': columns}, f,
+                      default=TreePersistence._json_default)
+
+    # Función para leer la copia binaria; las columnas (números y códigos de texto) se abren con mmap
+    @staticmethod
+    def read_snapshot(path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+
+        store = PropertyStore()
+        for column in meta['columns']:
+            name = column['name']
+            store.columns[name] = np.load(os.path.join(path, column['file']), mmap_mode='r')
+            if column['numeric']:
+                store.numeric.add(name)
+            else:
+                # El texto se decodifica recién al materializar una fila (PropertyStore.get)
+                store.vocabularies[name] = column['vocabulary']
+        # Con capacidad igual al tamaño, la primera inserción copia los arreglos a memoria antes de escribir
+        store.size = meta['size']
+        store.capacity = meta['size']
+        store.ids = np.load(os.path.join(path, 'ids.npy'))
+        store.tail_id = meta['tail_id']
+
+        # Las llaves y las filas se leen completas a memoria: cada nodo termina guardando listas de Python,
+        # y recorrerlas desde el mmap elemento por elemento es mucho más lento
+        keys = np.load(os.path.join(path, 'keys.npy'))
+        offsets = np.load(os.path.join(path, 'offsets.npy'))
+        rows = np.load(os.path.join(path, 'rows.npy'))
+        starts = offsets[:-1]
+        ends = offsets[1:].tolist()
+        row_list = rows.tolist()
+        buckets = [row_list[a:b] for a, b in zip(starts.tolist(), ends)]
+
+        tree = AVLTree(store)
+        prices, surfaces = (tree._bucket_sums(rows, starts, name) for name in ('price', 'surface_total'))
+        tree.root = tree._build_balanced(keys.tolist(), buckets, 0, len(buckets), prices, surfaces)
+        tree.node_count = len(buckets)
+        return tree
+
+    # Función auxiliar que aplica al árbol las operaciones del registro; retorna cuántas se aplicaron
+    @staticmethod
+    def _replay(tree, log_path):
+        applied = 0
+        if not os.path.exists(log_path):
+            return applied
+
+        with open(log_path) as f:
+            for line in f:
+                try:
+                    operation = json.loads(line)
+                except json.JSONDecodeError:
+                    # Una última línea incompleta corresponde a una escritura interrumpida
+                    break
+                if operation['op'] == 'insert' and 'metric' in operation:
+                    tree.insert(operation['metric'], operation['data'])
+                elif operation['op'] == 'insert':
+                    tree.insert_property(operation['data'])
+                elif operation['op'] == 'delete':
+                    tree.delete_node_by_metric(operation['metric'], operation['property_id'])
+                elif operation['op'] == 'delete_range':
+                    tree.delete_range(operation['lo'], operation['hi'])
+                elif operation['op'] == 'restore_rows':
+                    tree._restore_rows(operation['entries'])
+                applied += 1
+        return applied
+
+    # Función auxiliar que escribe la copia de una generación y luego la publica en CURRENT de forma atómica
+    def _write_generation(self, tree, generation):
+        self.write_snapshot(tree, self._snapshot_path(generation))
+        open(self._log_path(generation), 'w').close()
+
+        temporary = os.path.join(self.directory, 'CURRENT.tmp')
+        with open(temporary, 'w') as f:
+            f.write(str(generation))
+        os.replace(temporary, os.path.join(self.directory, 'CURRENT'))
+        self.generation = generation
+
+    # Función auxiliar que conecta el árbol con el registro para que cada operación quede guardada
+    def _attach(self, tree):
+        self.tree = tree
+        self.log = open(self._log_path(self.generation), 'a')
+        tree.journal = self
+
+    def _snapshot_path(self, generation):
+        return os.path.join(self.directory, f'snapshot-{generation}')
+
+    def _log_path(self, generation):
+        return os.path.join(self.directory, f'log-{generation}.jsonl')
+
+    # Función auxiliar para escribir en JSON los números de NumPy
+    @staticmethod
+    def _json_default(value):
+        if isinstance(value, np.generic):
+            return value.item()
+        raise TypeError(f'{type(value).__name__} no se puede guardar en JSON')
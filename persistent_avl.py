@@ -0,0 +1,418 @@
+# Árbol AVL persistente (inmutable): cada modificación copia solo el camino de la raíz al nodo cambiado
+# y publica la nueva raíz de una sola vez, así los lectores consultan una versión fija sin usar candados.
+import math
+import threading
+
+import numpy as np
+
+from avl_tree import PropertyStore
+from spatial_index import SpatialIndex
+
+# Clase para representar un nodo inmutable; rows es una tupla con las filas que comparten la métrica
+class PersistentNode:
+    __slots__ = ('key', 'rows', 'left', 'right', 'height', 'size')
+
+    def __init__(self, key, rows, left=None, right=None):
+        self.key = key
+        self.rows = rows
+        self.left = left
+        self.right = right
+        self.height = 1 + max(height(left), height(right))
+        self.size = len(rows) + size(left) + size(right)
+
+# Función para obtener la altura de un nodo inmutable
+def height(node):
+    return node.height if node else 0
+
+# Función para obtener el número de propiedades del subárbol de un nodo inmutable
+def size(node):
+    return node.size if node else 0
+
+# Función que crea un nodo nuevo con los hijos dados y, si queda desbalanceado, lo rota creando copias
+def balance(key, rows, left, right):
+    if height(left) > height(right) + 1:
+        if height(left.left) < height(left.right):
+            left = rotate_left(left)
+        return rotate_right(PersistentNode(key, rows, left, right))
+    if height(right) > height(left) + 1:
+        if height(right.right) < height(right.left):
+            right = rotate_right(right)
+        return rotate_left(PersistentNode(key, rows, left, right))
+    return PersistentNode(key, rows, left, right)
+
+# Función para realizar una rotación a la izquierda copiando los dos nodos que cambian
+def rotate_left(z):
+    y = z.right
+    return PersistentNode(y.key, y.rows, PersistentNode(z.key, z.rows, z.left, y.left), y.right)
+
+# Función para realizar una rotación a la derecha copiando los dos nodos que cambian
+def rotate_right(y):
+    x = y.left
+    return PersistentNode(x.key, x.rows, x.left, PersistentNode(y.key, y.rows, x.right, y.right))
+
+# Función auxiliar que reconstruye el camino guardado desde abajo hacia la raíz, rebalanceando cada copia
+def _rebuild(path, subtree):
+    for node, went_left in reversed(path):
+        if went_left:
+            subtree = balance(node.key, node.rows, subtree, node.right)
+        else:
+            subtree = balance(node.key, node.rows, node.left, subtree)
+    return subtree
+
+# Función que retorna la raíz de una versión nueva con la fila agregada bajo la métrica
+def insert(root, key, row):
+    path = []
+    node = root
+    while node:
+        if key == node.key:
+            return _rebuild(path, PersistentNode(node.key, node.rows + (row,), node.left, node.right))
+        went_left = key < node.key
+        path.append((node, went_left))
+        node = node.left if went_left else node.right
+    return _rebuild(path, PersistentNode(key, (row,)))
+
+# Función que retorna la raíz de una versión sin las filas indicadas (todas si rows es None)
+# y la tupla de filas eliminadas
+def delete(root, key, rows=None):
+    path = []
+    node = root
+    while node and node.key != key:
+        went_left = key < node.key
+        path.append((node, went_left))
+        node = node.left if went_left else node.right
+    if node is None:
+        return root, ()
+
+    removed = node.rows if rows is None else tuple(row for row in node.rows if row in rows)
+    if not removed:
+        return root, ()
+    if len(removed) < len(node.rows):
+        kept = tuple(row for row in node.rows if row not in removed)
+        return _rebuild(path, PersistentNode(node.key, kept, node.left, node.right)), removed
+
+    if node.left is None or node.right is None:
+        return _rebuild(path, node.left or node.right), removed
+
+    # Con dos hijos, el sucesor en orden ocupa el lugar del nodo eliminado
+    successor, right = _delete_min(node.right)
+    return _rebuild(path, balance(successor.key, successor.rows, node.left, right)), removed
+
+# Función que retorna la raíz de una versión en la que la métrica tiene exactamente las filas dadas:
+# cambia las filas del nodo, lo crea o lo quita (si rows está vacía)
+def replace(root, key, rows):
+    path = []
+    node = root
+    while node and node.key != key:
+        went_left = key < node.key
+        path.append((node, went_left))
+        node = node.left if went_left else node.right
+    if not rows:
+        return delete(root, key)[0] if node else root
+    if node is None:
+        return _rebuild(path, PersistentNode(key, rows))
+    return _rebuild(path, PersistentNode(key, rows, node.left, node.right))
+
+# Función que retorna las métricas de un subárbol entre lo y hi (inclusive), en orden
+def keys_between(root, lo, hi):
+    keys = []
+    stack = []
+    node = root
+    while stack or node:
+        while node:
+            stack.append(node)
+            node = node.left if node.key >= lo else None
+        node = stack.pop()
+        if node.key > hi:
+            break
+        if node.key >= lo:
+            keys.append(node.key)
+        node = node.right
+    return keys
+
+# Función que copia la forma de un AVLTree (nodos con key, rows, left y right) en nodos inmutables
+def copy_shape(node):
+    if node is None:
+        return None
+    return PersistentNode(node.key, tuple(node.rows), copy_shape(node.left), copy_shape(node.right))
+
+# Función auxiliar que quita el mínimo de un subárbol; retorna el nodo mínimo y la nueva raíz del subárbol
+def _delete_min(root):
+    path = []
+    node = root
+    while node.left:
+        path.append((node, True))
+        node = node.left
+    return node, _rebuild(path, node.right)
+
+# Función que construye un subárbol balanceado a partir de métricas distintas ordenadas y sus filas
+def build_balanced(keys, buckets, lo, hi):
+    if lo >= hi:
+        return None
+    mid = (lo + hi) // 2
+    return PersistentNode(keys[mid], buckets[mid],
+                          build_balanced(keys, buckets, lo, mid), build_balanced(keys, buckets, mid + 1, hi))
+
+# Clase para una versión fija del árbol; todas sus consultas ven el mismo estado aunque haya escrituras en curso.
+# store es una vista del almacén (PropertyStore.view) con las columnas que existían al publicar la versión, y
+# spatial un índice espacial de solo lectura (SpatialIndex.copy) o None si se arma con la primera búsqueda
+class TreeVersion:
+    __slots__ = ('root', 'store', 'number', 'spatial')
+
+    def __init__(self, root, store, number, spatial=None):
+        self.root = root
+        self.store = store
+        self.number = number
+        self.spatial = spatial
+
+    def __len__(self):
+        return size(self.root)
+
+    @property
+    def height(self):
+        return height(self.root)
+
+    # Función auxiliar para ubicar el nodo con una métrica
+    def _find_node(self, metric):
+        path = self._path(metric)
+        return path[-1] if path else None
+
+    # Función auxiliar que retorna los nodos desde la raíz hasta el de la métrica, o None si no existe;
+    # los nodos inmutables no guardan a su padre, así que los parentescos se leen de este camino
+    def _path(self, metric):
+        path = []
+        node = self.root
+        while node:
+            path.append(node)
+            if metric < node.key:
+                node = node.left
+            elif metric > node.key:
+                node = node.right
+            else:
+                return path
+        return None
+
+    # Función para buscar la primera propiedad con una métrica
+    def search_node_by_metric(self, metric):
+        node = self._find_node(metric)
+        return self.store.get(node.rows[0]) if node else None
+
+    # Función para obtener todas las propiedades con una métrica, indexadas por su identificador
+    def search_properties_by_metric(self, metric):
+        node = self._find_node(metric)
+        return {row: self.store.get(row) for row in node.rows} if node else {}
+
+    # Función para buscar las propiedades que cumplan los criterios, recorriendo solo el rango de métricas
+    def search_nodes_by_criteria(self, criteria):
+        lo = criteria.get('min_metric', -math.inf)
+        hi = criteria.get('max_metric', math.inf)
+        result = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            if lo <= node.key <= hi:
+                for row in node.rows:
+                    if self.store.meets_criteria(row, criteria):
+                        result.append(self.store.get(row))
+            if node.right and node.key <= hi:
+                stack.append(node.right)
+            if node.left and node.key >= lo:
+                stack.append(node.left)
+        return result
+
+    # Función para obtener el nivel de un nodo (la raíz tiene nivel 1)
+    def get_node_level(self, metric):
+        path = self._path(metric)
+        return len(path) if path else None
+
+    # Función para obtener el factor de balanceo de un nodo
+    def get_balance_factor_of_node(self, metric):
+        node = self._find_node(metric)
+        return height(node.left) - height(node.right) if node else None
+
+    # Funciones para encontrar el padre, el abuelo, el tío y el hermano de un nodo; retornan la primera
+    # propiedad del pariente, igual que en AVLTree
+    def find_parent_of_node(self, metric):
+        return self._relative_data(metric, lambda path: path[-2] if len(path) > 1 else None)
+
+    def find_grandparent_of_node(self, metric):
+        return self._relative_data(metric, lambda path: path[-3] if len(path) > 2 else None)
+
+    def find_uncle_of_node(self, metric):
+        return self._relative_data(metric, lambda path: self._sibling(path[:-1]) if len(path) > 2 else None)
+
+    def find_sibling_of_node(self, metric):
+        return self._relative_data(metric, self._sibling)
+
+    # Funciones de búsqueda por ubicación, iguales a las de AVLTree
+    def nearest(self, lat, lon, k=1, criteria=None):
+        return self._spatial_index().nearest(self.store, lat, lon, k, criteria)
+
+    def within_radius(self, lat, lon, radius_km, criteria=None):
+        return self._spatial_index().within_radius(self.store, lat, lon, radius_km, criteria)
+
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon, criteria=None):
+        return self._spatial_index().within_bbox(self.store, min_lat, min_lon, max_lat, max_lon, criteria)
+
+    # Función para obtener como texto el dibujo de la versión, con el mismo formato de AVLTree.render_tree
+    def render_tree(self):
+        from anytree import Node, RenderTree
+
+        if self.root is None:
+            return ''
+        anytree_root = None
+        stack = [(self.root, None)]
+        while stack:
+            node, parent = stack.pop()
+            data = [self.store.get(row) for row in node.rows]
+            new_node = Node(f"Key: {node.key}, Data: {data[0] if len(data) == 1 else data}", parent=parent)
+            anytree_root = anytree_root or new_node
+            # Se apila primero el derecho para que el izquierdo quede como primer hijo
+            stack.extend((child, new_node) for child in (node.right, node.left) if child)
+        return '\n'.join(f"{pre}{node.name}" for pre, fill, node in RenderTree(anytree_root))
+
+    # Función auxiliar que ubica el camino una sola vez y retorna la primera propiedad del pariente pedido
+    def _relative_data(self, metric, relative):
+        path = self._path(metric)
+        node = relative(path) if path else None
+        return self.store.get(node.rows[0]) if node else None
+
+    # Función auxiliar que retorna el hermano del último nodo de un camino
+    @staticmethod
+    def _sibling(path):
+        if len(path) < 2:
+            return None
+        node, parent = path[-1], path[-2]
+        return parent.right if parent.left is node else parent.left
+
+    # Función auxiliar que arma el índice espacial de la versión la primera vez que se consulta; la versión no
+    # cambia, así que dos lectores que lo armen a la vez obtienen el mismo índice
+    def _spatial_index(self):
+        if self.spatial is None:
+            self.spatial = SpatialIndex.build((row for node in self._inorder_nodes() for row in node.rows), self.store)
+        return self.spatial
+
+    # Función auxiliar para recorrer los nodos en orden
+    def _inorder_nodes(self):
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node
+            node = node.right
+
+    # Función para contar las propiedades con métrica entre lo y hi (inclusive)
+    def count_range(self, lo, hi):
+        return self._rank(hi, inclusive=True) - self._rank(lo, inclusive=False)
+
+    # Función auxiliar que cuenta las propiedades con métrica menor (o menor o igual) a la dada
+    def _rank(self, metric, inclusive):
+        count = 0
+        node = self.root
+        while node:
+            if metric < node.key or (metric == node.key and not inclusive):
+                node = node.left
+            else:
+                count += size(node.left) + len(node.rows)
+                node = node.right
+        return count
+
+# Clase para el Árbol AVL persistente: las escrituras se serializan con un candado
+# y los lectores toman una versión con snapshot() sin bloquearse
+class PersistentAVLTree:
+    def __init__(self, store=None):
+        self.store = store if store is not None else PropertyStore()
+        self._write_lock = threading.Lock()
+        self._current = TreeVersion(None, self.store.view(), 0)
+
+    # Función para construir el árbol a partir de un DataFrame ordenando una sola vez
+    @classmethod
+    def from_dataframe(cls, df):
+        metrics = (df['price'] / df['surface_total']).to_numpy(dtype=float)
+        order = np.argsort(metrics, kind='stable')
+        tree = cls(PropertyStore.from_dataframe(df))
+
+        keys = []
+        buckets = []
+        for key, row in zip(metrics[order].tolist(), order.tolist()):
+            if keys and keys[-1] == key:
+                buckets[-1].append(row)
+            else:
+                keys.append(key)
+                buckets.append([row])
+        root = build_balanced(keys, [tuple(bucket) for bucket in buckets], 0, len(keys))
+        tree._current = TreeVersion(root, tree.store.view(), 0)
+        return tree
+
+    # Función para obtener la versión actual; las versiones viejas se liberan cuando ningún lector las usa
+    def snapshot(self):
+        return self._current
+
+    # Función para insertar una propiedad publicando una versión nueva; retorna su identificador
+    def insert_property(self, property_data):
+        metric = property_data['price'] / property_data['surface_total']
+        with self._write_lock:
+            row = self.store.append(property_data)
+            self._publish(insert(self._current.root, metric, row))
+        return row
+
+    # Función para eliminar por métrica todas las propiedades del nodo, o solo la indicada por property_id;
+    # retorna el número de propiedades eliminadas
+    def delete_node_by_metric(self, metric, property_id=None):
+        with self._write_lock:
+            rows = None if property_id is None else (property_id,)
+            root, removed = delete(self._current.root, metric, rows)
+            if removed:
+                self._publish(root)
+        return len(removed)
+
+    # Funciones de lectura sobre la versión actual
+    def search_node_by_metric(self, metric):
+        return self.snapshot().search_node_by_metric(metric)
+
+    def search_properties_by_metric(self, metric):
+        return self.snapshot().search_properties_by_metric(metric)
+
+    def search_nodes_by_criteria(self, criteria):
+        return self.snapshot().search_nodes_by_criteria(criteria)
+
+    # Función auxiliar que publica la raíz nueva con una sola asignación; la versión lleva su propia vista
+    # del almacén, así un lector no recorre el diccionario de columnas mientras el escritor agrega una
+    def _publish(self, root):
+        self._current = TreeVersion(root, self.store.view(), self._current.number + 1)
+
+# Clase que publica versiones inmutables de un AVLTree que se sigue modificando en su lugar (la usa el servidor):
+# después de cada modificación del árbol se llama a sync con las métricas que tocó, y publish entrega a los
+# lectores una versión nueva con su vista del almacén y una copia del índice espacial
+class VersionPublisher:
+    def __init__(self, tree):
+        self.tree = tree
+        # El índice espacial se mantiene en el árbol y se copia al publicar; si cada versión lo armara
+        # con su primera búsqueda, se reconstruiría completo después de cada modificación
+        if tree.spatial is None:
+            tree.enable_spatial_index()
+        self.root = copy_shape(tree.root)
+        self._current = None
+        self.publish()
+
+    # Función para obtener la última versión publicada
+    def snapshot(self):
+        return self._current
+
+    # Función para copiar a la versión de trabajo las filas que el árbol tiene ahora en cada métrica
+    def sync(self, metrics):
+        for metric in metrics:
+            node = self.tree._find_node(metric)
+            self.root = replace(self.root, metric, tuple(node.rows) if node else ())
+
+    # Función para obtener las métricas de la versión de trabajo entre lo y hi (inclusive)
+    def keys_between(self, lo, hi):
+        return keys_between(self.root, lo, hi)
+
+    # Función para publicar la versión de trabajo con una sola asignación; retorna la versión publicada
+    def publish(self):
+        number = self._current.number + 1 if self._current else 0
+        self._current = TreeVersion(self.root, self.tree.store.view(), number, self.tree.spatial.copy())
+        return self._current
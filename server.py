@@ -0,0 +1,200 @@
+# Servidor de consultas: carga el árbol una sola vez y atiende operaciones JSON por línea (las mismas del modo
+# por lotes) sobre TCP local o un socket Unix. Las modificaciones que llegan dentro de una ventana corta se agrupan
+# y se ejecutan juntas en un hilo aparte; las lecturas no esperan a las modificaciones, porque se resuelven sobre
+# la última versión publicada del árbol (persistent_avl.TreeVersion).
+#
+#   python server.py --port 8765
+#   python server.py --socket /tmp/avl.sock --window-ms 2
+import argparse
+import asyncio
+import json
+import time
+from contextlib import nullcontext
+
+from batch import MUTATIONS, _json_default, execute
+from persistent_avl import VersionPublisher
+
+# Clase del servidor: una cola de modificaciones con una tarea que las agrupa y las aplica de a un bloque,
+# y lecturas sobre versiones inmutables que se publican al terminar cada bloque
+class QueryServer:
+    def __init__(self, tree, persistence=None, window=0.002, max_batch=512):
+        self.tree = tree
+        self.persistence = persistence
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = None
+        self.versions = VersionPublisher(tree)
+        # Lecturas en curso por versión y petición, para que las iguales se calculen una sola vez
+        self.reads = {}
+        self.stats = {'requests': 0, 'batches': 0, 'coalesced_reads': 0}
+
+    # Función para atender conexiones en localhost (TCP) o en un socket Unix hasta que se cancele
+    async def serve(self, host='127.0.0.1', port=8765, socket_path=None):
+        self.queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batch_loop())
+        if socket_path:
+            server = await asyncio.start_unix_server(self._handle_client, path=socket_path)
+        else:
+            server = await asyncio.start_server(self._handle_client, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+    # Función que lee las peticiones de una conexión; cada una se responde apenas termina su bloque,
+    # con el mismo "id" que traía, así un cliente puede enviar varias sin esperar
+    async def _handle_client(self, reader, writer):
+        pending = set()
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.create_task(self._answer(line, writer))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # Función auxiliar que resuelve una petición (encolando las modificaciones), espera su resultado
+    # y lo escribe en la conexión
+    async def _answer(self, line, writer):
+        try:
+            operation = json.loads(line)
+            if not isinstance(operation, dict):
+                raise ValueError("La petición debe ser un objeto JSON")
+        except ValueError as error:
+            operation = {}
+            result = {'error': f"{type(error).__name__}: {error}"}
+        else:
+            try:
+                if operation.get('op') in MUTATIONS:
+                    future = asyncio.get_running_loop().create_future()
+                    await self.queue.put((operation, future))
+                    result = await future
+                else:
+                    result = await self._read(operation)
+            except Exception as error:
+                result = {'error': f"{type(error).__name__}: {error}"}
+
+        if 'id' in operation:
+            result['id'] = operation['id']
+        writer.write((json.dumps(result, default=_json_default) + '\n').encode())
+        await writer.drain()
+
+    # Función auxiliar que resuelve una lectura en un hilo aparte sobre la última versión publicada, sin esperar
+    # a los bloques de modificaciones en curso; una lectura igual a otra que se está calculando sobre la misma
+    # versión espera ese resultado en lugar de repetirlo
+    async def _read(self, operation):
+        self.stats['requests'] += 1
+        version = self.versions.snapshot()
+        key = (version.number, json.dumps({name: value for name, value in operation.items() if name != 'id'},
+                                          sort_keys=True))
+        pending = self.reads.get(key)
+        if pending is None:
+            pending = asyncio.get_running_loop().run_in_executor(None, execute, version, operation)
+            self.reads[key] = pending
+            pending.add_done_callback(lambda _: self.reads.pop(key, None))
+        else:
+            self.stats['coalesced_reads'] += 1
+        # shield: si el cliente se desconecta, la lectura compartida sigue para las demás peticiones
+        return dict(await asyncio.shield(pending))
+
+    # Función que espera la primera modificación, junta las que lleguen dentro de la ventana y ejecuta el bloque;
+    # los bloques se ejecutan de a uno, por lo que las modificaciones quedan en orden de llegada
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # run_batch ya reporta los errores de cada operación; si aun así falla el bloque completo, cada petición
+            # recibe el error y el ciclo sigue atendiendo los bloques siguientes
+            try:
+                results = await loop.run_in_executor(None, self.run_batch, [operation for operation, _ in batch])
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    # Función para ejecutar un bloque de modificaciones en orden; se escriben al registro con un solo vaciado
+    # a disco y, al terminar, se publica la versión que verán las lecturas siguientes
+    def run_batch(self, operations):
+        results = []
+        self.stats['requests'] += len(operations)
+        self.stats['batches'] += 1
+        try:
+            with self._group():
+                for operation in operations:
+                    try:
+                        result = self._mutate(operation)
+                    except Exception as error:
+                        result = {'error': f"{type(error).__name__}: {error}"}
+                    results.append(result)
+        finally:
+            # También si el bloque falla a medias, la versión publicada refleja lo que sí se aplicó
+            self.versions.publish()
+        return results
+
+    # Función auxiliar que aplica una modificación al árbol y copia a la versión de trabajo las métricas que tocó
+    def _mutate(self, operation):
+        result = execute(self.tree, operation)
+        op = operation['op']
+        if op == 'insert':
+            data = operation['data']
+            touched = [data['price'] / data['surface_total']]
+        elif op == 'delete':
+            touched = [operation['metric']]
+        else:
+            # La versión de trabajo todavía tiene las métricas que delete_range quitó del árbol
+            touched = self.versions.keys_between(operation['lo'], operation['hi'])
+        self.versions.sync(touched)
+        return result
+
+    # Función auxiliar para agrupar la escritura del registro de operaciones, si hay persistencia
+    def _group(self):
+        return nullcontext() if self.persistence is None else self.persistence.group()
+
+def main(argv=None):
+    from persistence import TreePersistence
+
+    parser = argparse.ArgumentParser(description="Servidor de consultas del Árbol AVL de propiedades")
+    parser.add_argument('--csv', default='co_properties_final.csv', help="archivo CSV para la primera carga")
+    parser.add_argument('--data', default='avl_data', help="carpeta con la copia binaria y el registro de operaciones")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', help="ruta de un socket Unix en lugar de TCP")
+    parser.add_argument('--window-ms', type=float, default=2.0, help="ventana para agrupar peticiones")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    persistence = TreePersistence(args.data)
+    tree = persistence.open(args.csv)
+    where = args.socket or f"{args.host}:{args.port}"
+    print(f"Árbol cargado en {time.perf_counter() - start:.3f} s; escuchando en {where}", flush=True)
+
+    server = QueryServer(tree, persistence, window=args.window_ms / 1000)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        persistence.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+# Índice espacial de las propiedades: una grilla de celdas de latitud y longitud con las filas de cada celda.
+# Las distancias se calculan con la fórmula de haversine sobre arreglos de NumPy.
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Función para calcular la distancia en kilómetros entre un punto y un arreglo de puntos
+def haversine_km(lat, lon, lats, lons):
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    half_dlat = (lat2 - lat1) / 2
+    half_dlon = np.radians(np.asarray(lons) - lon) / 2
+    a = np.sin(half_dlat) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(half_dlon) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+# Función para validar un punto; lanza ValueError si no es una latitud y longitud válidas
+def check_point(lat, lon):
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        raise ValueError(f"Coordenadas no finitas: ({lat}, {lon})")
+    if not -90 <= lat <= 90:
+        raise ValueError(f"La latitud {lat} está fuera de [-90, 90]")
+    if not -180 <= lon <= 180:
+        raise ValueError(f"La longitud {lon} está fuera de [-180, 180]")
+
+# Clase para la grilla: cada celda de cell_degrees x cell_degrees guarda las filas que caen en ella
+class SpatialIndex:
+    def __init__(self, cell_degrees=0.01):
+        self.cell_degrees = cell_degrees
+        self.cells = {}
+        # Celdas extremas ocupadas (lat_min, lat_max, lon_min, lon_max); no se reducen al quitar filas
+        self.bounds = None
+        # Después de copy, las listas de las celdas se comparten con la copia; owned guarda las celdas que este
+        # índice ya reemplazó por una lista propia (None mientras no haya copias)
+        self.owned = None
+
+    # Función para crear el índice con todas las filas de un almacén que tengan coordenadas
+    @classmethod
+    def build(cls, rows, store, cell_degrees=0.01):
+        index = cls(cell_degrees)
+        rows = np.fromiter(rows, dtype=np.int64)
+        if len(rows) == 0 or not {'latitude', 'longitude'} <= store.numeric:
+            return index
+
+        lats = store.take(rows, 'latitude')
+        lons = store.take(rows, 'longitude')
+        valid = ~(np.isnan(lats) | np.isnan(lons))
+        rows, lats, lons = rows[valid], lats[valid], lons[valid]
+        cell_lats = np.floor(lats / cell_degrees).astype(np.int64).tolist()
+        cell_lons = np.floor(lons / cell_degrees).astype(np.int64).tolist()
+        for row, cell in zip(rows.tolist(), zip(cell_lats, cell_lons)):
+            index.cells.setdefault(cell, []).append(row)
+        index.bounds = (min(cell_lats), max(cell_lats), min(cell_lons), max(cell_lons))
+        return index
+
+    # Función para obtener una copia de solo lectura; comparte las listas de las celdas, y este índice copia
+    # cada lista antes de modificarla, así la copia no cambia aunque se sigan agregando o quitando filas
+    def copy(self):
+        copy = SpatialIndex(self.cell_degrees)
+        copy.cells = dict(self.cells)
+        copy.bounds = self.bounds
+        copy.owned = set()
+        self.owned = set()
+        return copy
+
+    # Función para registrar una fila nueva
+    def add(self, row, store):
+        cell = self._cell_of(row, store)
+        if cell is None:
+            return
+        self._own(cell).append(row)
+        i, j = cell
+        if self.bounds is None:
+            self.bounds = (i, i, j, j)
+        else:
+            lat_lo, lat_hi, lon_lo, lon_hi = self.bounds
+            self.bounds = (min(lat_lo, i), max(lat_hi, i), min(lon_lo, j), max(lon_hi, j))
+
+    # Función para quitar una fila
+    def remove(self, row, store):
+        cell = self._cell_of(row, store)
+        rows = self.cells.get(cell)
+        if rows and row in rows:
+            if len(rows) == 1:
+                del self.cells[cell]
+            else:
+                self._own(cell).remove(row)
+
+    # Función que retorna las filas de las celdas que tocan un rectángulo
+    def candidates_in_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        lat_lo, lon_lo = self._cell(min_lat, min_lon)
+        lat_hi, lon_hi = self._cell(max_lat, max_lon)
+        # Si el rectángulo cubre más celdas de las que existen, se recorren solo las celdas ocupadas
+        if (lat_hi - lat_lo + 1) * (lon_hi - lon_lo + 1) > len(self.cells):
+            cells = (rows for (i, j), rows in self.cells.items() if lat_lo <= i <= lat_hi and lon_lo <= j <= lon_hi)
+        else:
+            cells = (self.cells.get((i, j), ()) for i in range(lat_lo, lat_hi + 1) for j in range(lon_lo, lon_hi + 1))
+        return np.fromiter((row for rows in cells for row in rows), dtype=np.int64)
+
+    # Función que retorna las filas del anillo de celdas a distancia ring (en celdas) de la celda del punto
+    def candidates_in_ring(self, lat, lon, ring):
+        center_lat, center_lon = self._cell(lat, lon)
+        if ring == 0:
+            cells = [(center_lat, center_lon)]
+        elif 8 * ring > len(self.cells):
+            cells = [cell for cell in self.cells
+                     if max(abs(cell[0] - center_lat), abs(cell[1] - center_lon)) == ring]
+        else:
+            cells = [(center_lat + di, center_lon + dj)
+                     for di in range(-ring, ring + 1)
+                     for dj in ((-ring, ring) if abs(di) < ring else range(-ring, ring + 1))]
+        return np.fromiter((row for cell in cells for row in self.cells.get(cell, ())), dtype=np.int64)
+
+    # Función que retorna las filas de todas las celdas a distancia ring (en celdas) o más de la celda del punto,
+    # en una sola pasada por las celdas ocupadas
+    def candidates_beyond(self, lat, lon, ring):
+        center_lat, center_lon = self._cell(lat, lon)
+        cells = (rows for (i, j), rows in self.cells.items()
+                 if max(abs(i - center_lat), abs(j - center_lon)) >= ring)
+        return np.fromiter((row for rows in cells for row in rows), dtype=np.int64)
+
+    # Función para obtener el anillo más lejano que todavía puede tener celdas ocupadas
+    def max_ring(self, lat, lon):
+        if self.bounds is None:
+            return -1
+        center_lat, center_lon = self._cell(lat, lon)
+        lat_lo, lat_hi, lon_lo, lon_hi = self.bounds
+        return max(center_lat - lat_lo, lat_hi - center_lat, center_lon - lon_lo, lon_hi - center_lon, 0)
+
+    # Función para obtener la distancia mínima (km) desde el punto hasta cualquier celda fuera de los anillos 0..ring;
+    # el borde de esos anillos está al menos a ring celdas del punto en latitud y en longitud, y la distancia
+    # a un meridiano separado por d grados es asin(sin(d) cos(lat))
+    def ring_distance_km(self, lat, ring):
+        d = math.radians(min(90.0, ring * self.cell_degrees))
+        return EARTH_RADIUS_KM * math.asin(math.sin(d) * math.cos(math.radians(lat)))
+
+    # Función para obtener el rectángulo (min_lat, min_lon, max_lat, max_lon) que contiene un círculo
+    @staticmethod
+    def bbox_around(lat, lon, radius_km):
+        angle = radius_km / EARTH_RADIUS_KM
+        dlat = math.degrees(angle)
+        if angle >= math.pi / 2 or math.sin(angle) >= math.cos(math.radians(lat)):
+            return max(-90.0, lat - dlat), -180.0, min(90.0, lat + dlat), 180.0
+        dlon = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(lat))))
+        return max(-90.0, lat - dlat), lon - dlon, min(90.0, lat + dlat), lon + dlon
+
+    # Función para obtener las k propiedades de store más cercanas a un punto que cumplan los criterios;
+    # retorna pares (distancia en km, propiedad). Se recorren anillos de celdas hasta que ninguna celda
+    # sin revisar pueda estar más cerca que la k-ésima
+    def nearest(self, store, lat, lon, k=1, criteria=None):
+        check_point(lat, lon)
+        if k < 1:
+            raise ValueError(f"k debe ser al menos 1: {k}")
+        rows = []
+        distances = []
+        last_ring = self.max_ring(lat, lon)
+        ring = 0
+        while ring <= last_ring:
+            # Cuando los anillos ya recorridos suman más celdas que las ocupadas (p. ej. si los criterios no dejan
+            # candidatos), las celdas restantes se toman en una sola pasada en lugar de anillo por anillo
+            dense = (2 * ring + 1) ** 2 > len(self.cells)
+            if dense:
+                candidates = self._filter_rows(store, self.candidates_beyond(lat, lon, ring), criteria)
+            else:
+                candidates = self._filter_rows(store, self.candidates_in_ring(lat, lon, ring), criteria)
+            if len(candidates):
+                rows.append(candidates)
+                distances.append(self._distances_km(store, lat, lon, candidates))
+            if dense:
+                break
+            found = sum(len(chunk) for chunk in rows)
+            if found >= k and np.partition(np.concatenate(distances), k - 1)[k - 1] <= self.ring_distance_km(lat, ring):
+                break
+            ring += 1
+
+        if not rows:
+            return []
+        return self._sorted_by_distance(store, np.concatenate(rows), np.concatenate(distances), k)
+
+    # Función para obtener las propiedades a radius_km o menos de un punto que cumplan los criterios,
+    # ordenadas por distancia; retorna pares (distancia en km, propiedad)
+    def within_radius(self, store, lat, lon, radius_km, criteria=None):
+        check_point(lat, lon)
+        if not radius_km >= 0:
+            raise ValueError(f"El radio debe ser un número no negativo: {radius_km}")
+        rows = self._filter_rows(store, self.candidates_in_bbox(*self.bbox_around(lat, lon, radius_km)), criteria)
+        if len(rows) == 0 or not self._has_coordinates(store):
+            return []
+        distances = self._distances_km(store, lat, lon, rows)
+        inside = distances <= radius_km
+        return self._sorted_by_distance(store, rows[inside], distances[inside])
+
+    # Función para obtener las propiedades dentro de un rectángulo de latitud y longitud que cumplan los criterios,
+    # ordenadas por métrica
+    def within_bbox(self, store, min_lat, min_lon, max_lat, max_lon, criteria=None):
+        check_point(min_lat, min_lon)
+        check_point(max_lat, max_lon)
+        rows = self._filter_rows(store, self.candidates_in_bbox(min_lat, min_lon, max_lat, max_lon), criteria)
+        if len(rows) == 0 or not self._has_coordinates(store):
+            return []
+        lats = store.take(rows, 'latitude')
+        lons = store.take(rows, 'longitude')
+        rows = rows[(lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)]
+        metrics = store.take(rows, 'price') / store.take(rows, 'surface_total')
+        return [store.get(row) for row in rows[np.argsort(metrics, kind='stable')].tolist()]
+
+    # Función auxiliar que retorna la lista de una celda lista para modificarla, copiándola si la comparte con una copia
+    def _own(self, cell):
+        rows = self.cells.get(cell)
+        if rows is None or (self.owned is not None and cell not in self.owned):
+            rows = self.cells[cell] = list(rows or ())
+            if self.owned is not None:
+                self.owned.add(cell)
+        return rows
+
+    # Función auxiliar que indica si el almacén tiene latitud y longitud numéricas (un árbol vacío o cargado
+    # sin esas columnas no las tiene)
+    @staticmethod
+    def _has_coordinates(store):
+        return 'latitude' in store.numeric and 'longitude' in store.numeric
+
+    # Función auxiliar que aplica los criterios a un arreglo de filas de forma vectorizada
+    @staticmethod
+    def _filter_rows(store, rows, criteria):
+        if not criteria or len(rows) == 0:
+            return rows
+        return rows[store.criteria_mask(rows, criteria)]
+
+    # Función auxiliar para calcular la distancia de un arreglo de filas a un punto
+    @staticmethod
+    def _distances_km(store, lat, lon, rows):
+        return haversine_km(lat, lon, store.take(rows, 'latitude'), store.take(rows, 'longitude'))
+
+    # Función auxiliar que ordena por distancia (y por fila en caso de empate) y materializa las propiedades
+    @staticmethod
+    def _sorted_by_distance(store, rows, distances, limit=None):
+        order = np.lexsort((rows, distances))[:limit]
+        return [(distance, store.get(row)) for distance, row in zip(distances[order].tolist(), rows[order].tolist())]
+
+    # Función auxiliar para obtener la celda de una coordenada
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    # Función auxiliar para obtener la celda de una fila, o None si no tiene coordenadas
+    def _cell_of(self, row, store):
+        if 'latitude' not in store.numeric or 'longitude' not in store.numeric:
+            return None
+        lat = store.value(row, 'latitude')
+        lon = store.value(row, 'longitude')
+        if lat != lat or lon != lon:
+            return None
+        return self._cell(lat, lon)